@@ -1,19 +1,17 @@
-import numpy as np
 import os
 import sys
-from powerflow.Newton_Cartesian import NewtonCartesian
-from powerflow.Newton_Polar import NewtonPolar
-from powerflow.model import Model, Profile, NodeType
-from powerflow.report import Report
-root = os.getcwd()
+#仓库根目录，与当前工作目录无关
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-#主程序
-if __name__ == '__main__':
-    original_stdout = sys.stdout
-    # sys.stdout = open('output.txt', 'w')
+#示例：计算一个算例并输出全部信息
+def demo(path):
+    from powerflow.Newton_Cartesian import NewtonCartesian
+    from powerflow.Newton_Polar import NewtonPolar
+    from powerflow.model import Model, Profile, NodeType
+    from powerflow.report import Report
 
     # 读取数据文件
-    profile = Profile(os.path.join(root, "tests\\IEEE-14.th"))
+    profile = Profile(path)
     print(profile)
 
     # 生成一个空的模型
@@ -26,6 +24,7 @@ if __name__ == '__main__':
 
     # 从节点导纳模型生成节点导纳矩阵
     model.deriveYMatrix()  # nxn matrix
+    model.printYMatrix()
 
     #输出节点导纳模型信息
     model.printTopology()
@@ -47,3 +46,10 @@ if __name__ == '__main__':
     report.listBranches()
     #输出网络总损耗
     report.showTotalLoss()
+
+#主程序：带参数时作为批量计算命令行(见powerflow/cli.py)，不带参数时运行示例
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        from powerflow.cli import main
+        sys.exit(main())
+    demo(os.path.join(root, 'tests', 'IEEE-14.th'))
@@ -0,0 +1,203 @@
+import numpy as np
+import scipy.sparse as sp
+from powerflow.model import Model, NodeType
+from powerflow.jacobian import PolarJacobian
+from powerflow.linalg import SparseLU, DenseLU
+from powerflow.Newton_Polar import NewtonPolar
+from powerflow.telemetry import telemetry
+
+#连续潮流：节点注入功率沿方向d随负荷参数λ变化 Sset(λ) = Sset + λ·d，从基态出发以切向量预测、
+#局部参数化的牛顿法校正，一次计算得到完整的PV曲线(鼻型曲线)和最大负荷点
+#未知量与NewtonPolar相同为 [Δθ, ΔV/V]，再加上λ；扩展后的矩阵为 [[J, -d], [e_k, 0]]，
+#J沿用极坐标雅可比矩阵的结构，e_k为所选的连续参数(切向量中变化最大的分量)
+class ContinuationPowerFlow:
+    #direction为各节点注入功率的变化方向(复数数组，或节点名称到复数的映射)，默认按THLOAD/LOAD2负荷同比例增长
+    def __init__(self, model: Model, sparse=False, direction=None):
+        self.model = model
+        self.sparse = sparse
+        self.precision = 1E-6
+        self.maxIterations = 10 #每次校正的最大迭代次数
+        self.step = 0.1 #初始步长
+        self.minStep = 1E-4
+        self.maxStep = 1.0
+        self.maxSteps = 500
+        self.stopRatio = 0.5 #越过最大负荷点后，λ下降到最大值的该比例时停止
+
+        #从基态潮流出发，λ=0
+        self.base = NewtonPolar(model, sparse=sparse)
+        self.base.solve()
+        if not self.base.converged:
+            raise RuntimeError('Base case power flow did not converge')
+        self.Y = self.base.Y
+
+        buses = model.state.buses
+        n = len(model.nodes)
+        if direction is None:
+            direction = -(buses.Pd + 1j * buses.Qd)
+        elif isinstance(direction, dict):
+            d = np.zeros(n, dtype=complex)
+            for name, value in direction.items():
+                d[model.nodeIndex[name]] = value
+            direction = d
+        self.direction = np.asarray(direction, dtype=complex)
+
+        #基态的给定注入功率，PV节点的无功和平衡节点不参与方程
+        types = buses.type
+        self.pvpq = np.flatnonzero(types != NodeType.Slack.value)
+        self.pq = types[self.pvpq] == NodeType.PQ.value
+        self.Sset = buses.P + 1j * buses.Q
+        self.jacobian = PolarJacobian(self.Y, self.pvpq, self.pq)
+        self.lus = {} #各连续参数对应的分解，结构相同时复用列排序
+
+    #方程不平衡量 S(V) - Sset(λ)，PV节点的无功方程为零
+    def mismatch(self, V, lam):
+        S = V * np.conj(self.Y @ V)
+        D = S - self.Sset - lam * self.direction
+        return S, np.concatenate([D[self.pvpq].real, np.where(self.pq, D[self.pvpq].imag, 0.)])
+
+    #方程对λ的导数 -d
+    def dF(self):
+        d = self.direction[self.pvpq]
+        return -np.concatenate([d.real, np.where(self.pq, d.imag, 0.)])
+
+    #分解扩展矩阵 [[J, -d], [e_k, 0]]，返回可求解的分解
+    def factorize(self, V, S, k):
+        size = 2 * len(self.pvpq)
+        J = self.jacobian.sparse(V, S)
+        e = sp.csr_matrix(([1.], ([0], [k])), shape=(1, size + 1))
+        A = sp.bmat([[J, sp.csc_matrix(self.dF()[:, None])], [e[:, :size], e[:, size:]]], format='csc')
+        if self.sparse:
+            lu = self.lus.setdefault(k, SparseLU())
+            return lu.factorize(A)
+        return DenseLU().factorize(A.toarray())
+
+    #当前点的切向量，k为连续参数，sign为切向量沿k分量的方向
+    def tangent(self, V, S, k, sign):
+        rhs = np.zeros(2 * len(self.pvpq) + 1)
+        rhs[-1] = sign
+        t = self.factorize(V, S, k).solve(rhs)
+        return t / np.linalg.norm(t)
+
+    #按增量z(与未知量 [Δθ, ΔV/V, Δλ] 对应)修改电压和λ
+    def move(self, Va, Vm, lam, z):
+        m = len(self.pvpq)
+        Va, Vm = Va.copy(), Vm.copy()
+        Va[self.pvpq] += z[:m]
+        Vm[self.pvpq] *= 1 + z[m:2 * m]
+        return Va, Vm, lam + z[-1]
+
+    #以预测点为初值校正，连续参数k固定为预测值，返回(是否收敛, Va, Vm, λ, 迭代次数)
+    def correct(self, Va, Vm, lam, k, target):
+        m = len(self.pvpq)
+        for it in range(self.maxIterations):
+            V = Vm * np.exp(1j * Va)
+            S, F = self.mismatch(V, lam)
+            #连续参数的残差，电压分量按相对值计
+            if k < m:
+                r = target - Va[self.pvpq[k]]
+            elif k < 2 * m:
+                r = (target - Vm[self.pvpq[k - m]]) / Vm[self.pvpq[k - m]]
+            else:
+                r = target - lam
+            err = max(np.max(np.abs(F), initial=0.), abs(r))
+            if err < self.precision:
+                return True, Va, Vm, lam, it
+            if not np.isfinite(err) or err > 1E3:
+                break
+            z = self.factorize(V, S, k).solve(np.append(-F, r))
+            Va, Vm, lam = self.move(Va, Vm, lam, z)
+        return False, Va, Vm, lam, self.maxIterations
+
+    #连续参数k对应的当前值
+    def parameter(self, Va, Vm, lam, k):
+        m = len(self.pvpq)
+        if k < m:
+            return Va[self.pvpq[k]]
+        if k < 2 * m:
+            return Vm[self.pvpq[k - m]]
+        return lam
+
+    #计算PV曲线，返回各点的λ和节点电压幅值；最大负荷点的状态写回模型
+    def solve(self):
+        buses = self.model.state.buses
+        m = len(self.pvpq)
+        Va, Vm, lam = np.angle(buses.V), np.abs(buses.V), 0.
+        points = [(lam, Vm.copy(), Va.copy())]
+
+        #第一个切向量以λ为连续参数，沿λ增大方向
+        k, sign = 2 * m, 1.
+        V = Vm * np.exp(1j * Va)
+        S, _ = self.mismatch(V, lam)
+        t = self.tangent(V, S, k, sign)
+        step = self.step
+        nose = 0 #最大负荷点在points中的序号
+        resume = None #定位最大负荷点之前的步长，越过后恢复
+        self.steps = 0
+        while self.steps < self.maxSteps:
+            #预测：沿切向量前进step，再以切向量中变化最大的分量作为连续参数校正
+            k = int(np.argmax(np.abs(t)))
+            Vpa, Vpm, lp = self.move(Va, Vm, lam, step * t)
+            converged, Vca, Vcm, lc, it = self.correct(Vpa, Vpm, lp, k, self.parameter(Vpa, Vpm, lp, k))
+            telemetry.iteration('ContinuationPowerFlow', self.steps, step, converged=converged, lam=float(lc), corrector=it)
+            if not converged:
+                step /= 2
+                if step < self.minStep:
+                    break
+                continue
+
+            #新点的切向量，方向与上一个切向量一致
+            V = Vcm * np.exp(1j * Vca)
+            S, _ = self.mismatch(V, lc)
+            tn = self.tangent(V, S, k, 1.)
+            if tn @ t < 0:
+                tn = -tn
+            #越过最大负荷点(λ分量变号)时缩小步长，将最大负荷点定位到minStep以内
+            crossed = tn[-1] < 0 <= t[-1]
+            if crossed and step > self.minStep * 2:
+                resume = resume or step
+                step /= 2
+                continue
+
+            Va, Vm, lam, t = Vca, Vcm, lc, tn
+            points.append((lam, Vm.copy(), Va.copy()))
+            if lam > points[nose][0]:
+                nose = len(points) - 1
+            self.steps += 1
+            if lam < self.stopRatio * points[nose][0] or lam < 0:
+                break
+            #校正迭代次数少时增大步长
+            if crossed and resume:
+                step, resume = resume, None
+            elif it <= 3:
+                step = min(step * 1.5, self.maxStep)
+            elif it > 5:
+                step = max(step / 2, self.minStep)
+
+        #PV曲线，节点按输入文件的顺序排列
+        order = self.model.inputOrder()
+        self.lam = np.array([point[0] for point in points])
+        self.Vm = np.array([point[1][order] for point in points])
+        self.names = [self.model.nodes[i].name for i in order.tolist()]
+        self.lambdaMax = self.lam[nose]
+
+        #最大负荷点的状态写回模型
+        lam, Vm, Va = points[nose]
+        S = self.Sset + lam * self.direction
+        buses.Pd = buses.Pd - lam * self.direction.real
+        buses.Qd = buses.Qd - lam * self.direction.imag
+        buses.P = S.real
+        buses.Q = S.imag
+        buses.V = Vm * np.exp(1j * Va)
+        self.model.applyPower(self.Y)
+        self.model.calBranchesFlow()
+        return self.lam, self.Vm
+
+    #输出PV曲线
+    def listCurve(self, names=None):
+        names = self.names if names is None else names
+        columns = [self.names.index(name) for name in names]
+        print('\t'.join(['lambda'] + names))
+        for k in range(len(self.lam)):
+            print('\t'.join(['%.4f' % self.lam[k]] + ['%.4f' % self.Vm[k, i] for i in columns]))
+        print(f"Maximum loading: lambda = {'%.4f' % self.lambdaMax}")
+        print()
@@ -0,0 +1,119 @@
+import numpy as np
+import scipy.sparse as sp
+from powerflow.model import Model, NodeType
+from powerflow.linalg import SparseLU, DenseLU
+from powerflow.utils import XOnly
+from powerflow.telemetry import telemetry
+
+#直流潮流：忽略支路电阻和对地支路，节点电压幅值取给定值，有功功率与相角差成线性关系 P = B'θ
+#B'与快速解耦法相同，由支路导纳Branch.Y忽略电阻后形成；拓扑不变时B'的分解、PTDF和LODF只计算一次，
+#之后大量注入功率变化和单支路开断均可用矩阵向量乘法筛选，越限的情况再用交流潮流校核
+class DCPowerFlow:
+    def __init__(self, model: Model, sparse=True):
+        self.model = model
+        self.sparse = sparse
+        self.model.deriveYMatrix(sparse)
+        self.NodeCount = len(self.model.nodes)
+        self.factorize()
+        self.model.listeners.add(self)
+
+    #形成B'并分解，清空缓存的PTDF和LODF
+    def factorize(self):
+        model = self.model
+        n = self.NodeCount
+        #支路电纳 1/X，退出运行的支路为零
+        self.b = -XOnly(model.branchY).imag
+        self.A = model.incidenceMatrix() #支路-节点关联矩阵
+        B = (self.A.T @ sp.diags(self.b) @ self.A).tocsc()
+
+        types = model.state.buses.type
+        self.slack = np.flatnonzero(types == NodeType.Slack.value)
+        self.pvpq = np.flatnonzero(types != NodeType.Slack.value)
+        with telemetry.phase('factorize', solver='DCPowerFlow'):
+            Bp = B[self.pvpq][:, self.pvpq]
+            self.Bs = B[self.pvpq][:, self.slack] #非平衡节点与平衡节点之间的元素
+            self.lu = SparseLU(model.factorOrdering()).factorize(Bp) if self.sparse else DenseLU().factorize(Bp.toarray())
+        self.PTDF = None
+        self.LODF = None
+
+    #支路参数或投退状态改变时由模型调用，重新形成B'
+    def onYUpdate(self, update, structural):
+        self.factorize()
+
+    #由节点注入有功功率P(可带前置批量维度)求节点相角，平衡节点相角取给定值
+    def calTheta(self, P):
+        P = np.asarray(P, dtype=float)
+        theta = np.empty(P.shape)
+        theta[..., self.slack] = np.angle(self.model.state.buses.V[self.slack])
+        rhs = P[..., self.pvpq] - (self.Bs @ theta[..., self.slack].T).T
+        theta[..., self.pvpq] = self.lu.solve(rhs.T).T
+        return theta
+
+    #由节点相角求支路有功功率
+    def calFlow(self, theta):
+        return (self.A @ theta.T).T * self.b
+
+    #求解，相角和支路功率写回模型，平衡节点有功为全网注入功率之和的相反数，网损为零
+    def solve(self):
+        buses, branches = self.model.state.buses, self.model.state.branches
+        P = buses.P.copy()
+        P[self.slack] = 0
+        theta = self.calTheta(P)
+        flow = self.calFlow(theta)
+
+        buses.V = np.abs(buses.oV) * np.exp(1j * theta)
+        #平衡节点有功由节点功率平衡求出
+        injection = self.A.T @ flow
+        buses.P[self.slack] = injection[self.slack]
+        gen = buses.type != NodeType.PQ.value
+        buses.Pg[gen] = buses.P[gen] + buses.Pd[gen]
+        branches.Flow = flow
+        branches.I = flow
+        branches.Loss = 0
+        self.model.loss = 0j
+        self.theta, self.flow = theta, flow
+        self.converged = True
+        self.iterations = 0
+        return flow
+
+    #功率传输分布因子(支路数×节点数)：节点注入1单位功率(由平衡节点吸收)时各支路功率的变化
+    #PTDF = diag(b)·A·B'^{-1}，按 B'^{-1}·(diag(b)·A)^T 一次求解所有支路，平衡节点所在列为零；结果为稠密矩阵
+    def calPTDF(self):
+        if self.PTDF is None:
+            with telemetry.phase('ptdf', solver='DCPowerFlow'):
+                m, n = self.A.shape
+                rhs = (sp.diags(self.b) @ self.A[:, self.pvpq]).T.toarray()
+                self.PTDF = np.zeros((m, n))
+                self.PTDF[:, self.pvpq] = self.lu.solve(rhs).T
+        return self.PTDF
+
+    #开断分布因子(支路数×支路数)：第k条支路开断后其原有功率转移到各支路的比例，
+    #开断后网络解列的支路(径向支路)所在列为nan
+    def calLODF(self):
+        if self.LODF is None:
+            PTDF = self.calPTDF()
+            with telemetry.phase('lodf', solver='DCPowerFlow'):
+                #支路两端注入一对功率时各支路功率的变化
+                H = (self.A @ PTDF.T).T
+                d = 1 - np.diag(H)
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    LODF = H / d
+                LODF[:, np.abs(d) < 1e-9] = np.nan
+                LODF[:, self.b == 0] = 0
+                np.fill_diagonal(LODF, -1)
+                self.LODF = LODF
+        return self.LODF
+
+    #注入功率变化筛选：dP为(场景数×节点数)的注入功率变化，返回各场景的支路功率(场景数×支路数)
+    def screenInjections(self, dP, flow=None):
+        flow = self.flow if flow is None else flow
+        return flow + np.asarray(dP) @ self.calPTDF().T
+
+    #单支路开断筛选：返回第k列为第k条支路开断后各支路功率的矩阵(支路数×开断数)，outages为开断的支路序号
+    def screenOutages(self, outages=None, flow=None):
+        flow = self.flow if flow is None else flow
+        outages = np.arange(len(flow)) if outages is None else np.asarray(outages, dtype=int)
+        LODF = self.calLODF()[:, outages]
+        after = flow[:, None] + LODF * flow[outages]
+        after[outages, np.arange(len(outages))] = 0
+        return after
@@ -0,0 +1,104 @@
+import numpy as np
+from powerflow.model import Model, NodeType
+from powerflow.Newton_Polar import NewtonPolar
+from powerflow.linalg import SparseLU, DenseLU, WoodburyLU
+from powerflow.utils import XOnly
+from powerflow.telemetry import telemetry
+
+#快速解耦法(P-Q分解法)，输入输出与NewtonPolar相同
+#variant为'XB'时B'忽略支路电阻，为'BX'时B''忽略支路电阻
+class FastDecoupled(NewtonPolar):
+    def __init__(self, model: Model, sparse=False, variant='XB'):
+        super().__init__(model, sparse)
+        if variant not in ('XB', 'BX'):
+            raise ValueError(f'Unknown fast decoupled variant: {variant}')
+        self.variant = variant
+        with telemetry.phase('factorize', solver='FastDecoupled', variant=variant):
+            self.factorize()
+
+    #生成B'和B''并分解，网络拓扑不变时只需进行一次
+    def factorize(self):
+        model = self.model
+        n = self.NodeCount
+        f, t, y = model.branchFrom, model.branchTo, model.branchY
+
+        #忽略电阻后的支路导纳 1/(jX)
+        yx = XOnly(y)
+
+        #B'不计节点对地支路，B''计入节点对地支路
+        Bp = -model.assembleYMatrix(n, f, t, yx if self.variant == 'XB' else y, np.zeros(n), self.sparse).imag
+        Bpp = -model.assembleYMatrix(n, f, t, y if self.variant == 'XB' else yx, model.nodeYs, self.sparse).imag
+
+        types = model.state.buses.type
+        self.pvpq = np.flatnonzero(types != NodeType.Slack.value)
+        self.pq = np.flatnonzero(types == NodeType.PQ.value)
+
+        #节点序号到B'、B''中行列位置的映射，平衡节点(和B''中的PV节点)为-1
+        self.posP = -np.ones(n, dtype=int)
+        self.posP[self.pvpq] = np.arange(len(self.pvpq))
+        self.posQ = -np.ones(n, dtype=int)
+        self.posQ[self.pq] = np.arange(len(self.pq))
+
+        #分解结果在支路投退、参数修改时以低秩修正更新
+        if self.sparse:
+            lus = SparseLU(model.factorOrdering()), SparseLU(model.factorOrdering())
+        else:
+            lus = DenseLU(), DenseLU()
+        self.Bp_lu = WoodburyLU(lus[0], Bp[self.pvpq][:, self.pvpq])
+        self.Bpp_lu = WoodburyLU(lus[1], Bpp[self.pq][:, self.pq])
+
+    #节点导纳矩阵局部修改时，以低秩修正更新B'和B''的分解
+    def onYUpdate(self, update, structural):
+        super().onYUpdate(update, structural)
+        series = XOnly
+        idx, Dp = update.block(series=series if self.variant == 'XB' else None, shunt=False)
+        idx, Dpp = update.block(series=series if self.variant == 'BX' else None, shunt=True)
+        for lu, pos, D in [(self.Bp_lu, self.posP, Dp), (self.Bpp_lu, self.posQ, Dpp)]:
+            keep = pos[idx] >= 0
+            lu.update(pos[idx][keep], -D.imag[np.ix_(keep, keep)])
+
+    #计算迭代函数，交替进行P-θ和Q-V迭代，B'和B''的分解在迭代中保持不变
+    def cal(self, node):
+        Y = self.Y
+        pvpq, pq = self.pvpq, self.pq
+        err = self.precision
+        # 每个节点发电机与负荷的净注入功率
+        snet = node[:, 2] + node[:, 3]*1j - node[:, 4] - node[:, 5]*1j
+        Vm = node[:, 6].copy()
+        Va = node[:, 7].copy()
+
+        #归一化的功率不平衡量 (S - Sset)/V
+        def mismatch():
+            V = Vm * np.exp(1j * Va)
+            S = V * np.conj(Y @ V)
+            return V, S, (S - snet) / Vm
+
+        self.converged = False
+        nit = 1  # 当前迭代次数
+        nitmax = 100
+        V, S, mis = mismatch()
+        while nit < nitmax:
+            DS = S - snet
+            maxDelta = max(np.max(np.abs(DS[pvpq].real), initial=0.), np.max(np.abs(DS[pq].imag), initial=0.))
+            telemetry.iteration('FastDecoupled', nit - 1, maxDelta)
+            if maxDelta < err:
+                self.converged = True
+                break
+
+            #P-θ迭代
+            Va[pvpq] -= self.Bp_lu.solve(mis[pvpq].real)
+            V, S, mis = mismatch()
+
+            #Q-V迭代
+            if len(pq):
+                Vm[pq] -= self.Bpp_lu.solve(mis[pq].imag)
+                V, S, mis = mismatch()
+
+            nit = nit + 1
+
+        self.iterations = nit - 1
+        self.factorizations = self.Bp_lu.factorizations + self.Bpp_lu.factorizations
+
+        node[:, 6] = Vm
+        node[:, 7] = Va
+        return self.calGeneratorPower(node, S)
@@ -0,0 +1,129 @@
+import numpy as np
+import scipy.sparse as sp
+from powerflow.model import Model, NodeType
+from powerflow.jacobian import PolarJacobian
+from powerflow.linalg import SparseLU
+from powerflow.telemetry import telemetry
+
+#批量牛顿迭代法，极坐标法
+#同一网络下的多组节点注入功率共用一个节点导纳矩阵和雅可比矩阵结构，
+#不平衡量和雅可比矩阵数值对所有场景一次性计算
+class NewtonBatch:
+    #sparse为True时使用稀疏节点导纳矩阵，逐场景进行稀疏LU分解
+    def __init__(self, model: Model, sparse=False):
+        self.model = model
+        Y = self.model.deriveYMatrix(sparse) #节点导纳矩阵
+
+        #列顺序与model.nodes一致
+        buses = self.model.state.buses
+        self.names = [node.name for node in self.model.nodes]
+        self.setup(Y, buses.type, buses.P, buses.Q, buses.V, sparse)
+        self.model.listeners.add(self)
+
+    #不经过模型，直接由节点导纳矩阵和节点数据建立求解器(如工作进程中位于共享内存的导纳矩阵)
+    @staticmethod
+    def fromArrays(Y, types, P0, Q0, V0, sparse=False):
+        cal = NewtonBatch.__new__(NewtonBatch)
+        cal.model = None
+        cal.names = None
+        cal.setup(Y, types, P0, Q0, V0, sparse)
+        return cal
+
+    #由节点导纳矩阵、节点类型和基准节点数据初始化
+    def setup(self, Y, types, P0, Q0, V0, sparse):
+        self.sparse = sparse
+        self.Y = Y
+        self.NodeCount = Y.shape[0] #节点数量
+        self.precision = 1E-6 #迭代精度
+        self.maxIterations = 100
+        self.denseBytes = 64 << 20 #稠密模式下一块雅可比矩阵的内存上限(字节)
+
+        self.P0 = np.array(P0, dtype=float) #基准节点注入有功
+        self.Q0 = np.array(Q0, dtype=float) #基准节点注入无功
+        self.V0 = np.array(V0, dtype=complex) #初始电压
+
+        self.pvpq = np.flatnonzero(types != NodeType.Slack.value)
+        pq = types[self.pvpq] == NodeType.PQ.value
+
+        self.buildJacobian(pq)
+        self.lu = SparseLU()
+
+    #生成雅可比矩阵结构
+    def buildJacobian(self, pq):
+        self.jacobian = PolarJacobian(self.Y, self.pvpq, pq)
+
+        #稠密模式下CSC数据对应的行列坐标
+        J = self.jacobian
+        self.jrows = J.indices
+        self.jcols = np.repeat(np.arange(J.shape[1]), np.diff(J.indptr))
+
+    #节点导纳矩阵局部修改时由模型调用，重建雅可比矩阵，结构变化时不再使用缓存的列排序
+    def onYUpdate(self, update, structural):
+        if self.Y is not self.model.Y:
+            self.model.stampYMatrix(self.Y, *update.block())
+        self.buildJacobian(self.jacobian.pq)
+        if structural:
+            self.lu = SparseLU()
+
+    #求解S个场景，P、Q为(S×n)的节点注入功率，V0为可选的(S×n)或(n,)初始电压，返回(S×n)的节点复电压
+    def solve(self, P, Q, V0=None):
+        P = np.atleast_2d(P)
+        Q = np.atleast_2d(Q)
+        Sset = P + Q * 1j
+        count = Sset.shape[0]
+        m = len(self.pvpq)
+        pvpq = self.pvpq
+        pq = self.jacobian.pq
+
+        V = np.broadcast_to(self.V0 if V0 is None else V0, Sset.shape).astype(complex)
+        Vm = np.abs(V)
+        Va = np.angle(V)
+
+        self.converged = np.zeros(count, dtype=bool)
+        self.iterations = np.zeros(count, dtype=int)
+        for nit in range(self.maxIterations):
+            #所有场景的注入功率 S = V∘conj(Y·V)
+            V = Vm * np.exp(1j * Va)
+            S = V * np.conj((self.Y @ V.T).T)
+            DS = Sset - S
+            F = np.concatenate([DS[:, pvpq].real, np.where(pq, DS[:, pvpq].imag, 0.)], axis=1)
+
+            mismatch = np.max(np.abs(F), axis=1, initial=0.)
+            self.converged = mismatch < self.precision
+            telemetry.iteration('NewtonBatch', nit, np.max(mismatch, initial=0.), active=int(np.count_nonzero(~self.converged)))
+            active = np.flatnonzero(~self.converged)
+            if len(active) == 0:
+                break
+            self.iterations[active] += 1
+
+            #只对未收敛的场景计算雅可比矩阵并求解
+            with telemetry.phase('jacobian', solver='NewtonBatch'):
+                data = self.jacobian.data(V[active], S[active])
+            with telemetry.phase('solve', solver='NewtonBatch'):
+                delt = self.calDelta(data, F[active])
+
+            Va[active[:, None], pvpq] += delt[:, :m]
+            Vm[active[:, None], pvpq] *= 1 + delt[:, m:]
+
+        return Vm * np.exp(1j * Va)
+
+    #由各场景的雅可比矩阵数据求解修正量
+    #稠密模式下按块形成各场景的稠密雅可比矩阵，每块占用的内存不超过denseBytes(至少一个场景)
+    def calDelta(self, data, F):
+        if not self.sparse:
+            size = self.jacobian.shape[0]
+            chunk = max(1, self.denseBytes // (size * size * 8))
+            delt = np.empty(F.shape)
+            for start in range(0, len(data), chunk):
+                end = min(start + chunk, len(data))
+                J = np.zeros((end - start,) + self.jacobian.shape)
+                J[:, self.jrows, self.jcols] = data[start:end]
+                delt[start:end] = np.linalg.solve(J, F[start:end, :, None])[:, :, 0]
+            return delt
+
+        #各场景结构相同，共用同一个列排序
+        J = self.jacobian
+        return np.array([
+            self.lu.factorize(sp.csc_matrix((d, J.indices, J.indptr), shape=J.shape)).solve(f)
+            for d, f in zip(data, F)
+        ])
@@ -1,55 +1,129 @@
 import numpy as np
 from powerflow.model import Model, NodeType
 from powerflow.utils import C2P, P2C, P2Complex
+from powerflow.jacobian import CartesianJacobian
+from powerflow.linalg import SparseLU, DenseLU
+from powerflow.telemetry import telemetry
 
 #牛顿迭代法，直角坐标法
 class NewtonCartesian:
     times = 0
 
-    #输入模型，获取节点导纳矩阵
-    def __init__(self, model: Model):
+    #输入模型，获取节点导纳矩阵，sparse为True时使用稀疏节点导纳矩阵
+    #reuse为True时沿用上次分解的雅可比矩阵，不平衡量下降到上次的refreshRatio倍以下时继续沿用，否则重新形成并分解
+    #qlimits为True时检查PV节点的无功限值，越限的节点在雅可比矩阵中按PQ节点处理，不重排节点、不重建导纳矩阵
+    def __init__(self, model: Model, sparse=False, reuse=False, qlimits=False):
         self.model = model
-        self.Y = self.model.deriveYMatrix()
+        self.sparse = sparse
+        self.Y = self.model.deriveYMatrix(sparse)
         self.NodeCount = len(self.model.nodes)
         self.precision = 1E-6
+        self.maxIterations = 100
+        self.reuse = reuse
+        self.refreshRatio = 0.25
+        self.iterations = 0 #迭代次数
+        self.factorizations = 0 #雅可比矩阵分解次数
+
+        self.loadBuses()
+        buses = self.model.state.buses
+        self.pvpq = np.flatnonzero(buses.type != NodeType.Slack.value)
+        pq = buses.type[self.pvpq] == NodeType.PQ.value
+
+        #雅可比矩阵结构和列排序在迭代中复用
+        self.jacobian = CartesianJacobian(self.Y, self.pvpq, pq)
+        self.lu = SparseLU() if sparse else DenseLU()
+        self.stale = True #分解是否已过期
+        self.qlimits = qlimits
+        self.maxSwitches = 30 #无功越限检查的最多轮数，达到后仍有节点越限时记为不收敛
+        self.limited = np.zeros(self.NodeCount, dtype=np.int8) #各节点的无功越限状态，见Model.checkQLimits
+        self.model.listeners.add(self)
+
+    #节点电压、给定功率和PV节点电压幅值以数组形式参与迭代，每次求解前从模型的节点表读取
+    def loadBuses(self):
+        buses = self.model.state.buses
+        self.V = buses.V.copy()
+        self.S = buses.P + buses.Q * 1j
+        self.Vset = np.abs(buses.oV)
+
+    #节点导纳矩阵局部修改时由模型调用，重建雅可比矩阵，结构变化时不再使用缓存的列排序
+    def onYUpdate(self, update, structural):
+        if self.Y is not self.model.Y:
+            self.model.stampYMatrix(self.Y, *update.block())
+        self.jacobian = CartesianJacobian(self.Y, self.pvpq, self.jacobian.pq)
+        if structural and self.sparse:
+            self.lu = SparseLU()
+        self.stale = True
 
     #求解
     def solve(self):
-        print("Solving...")
         # self.initQ()
 
         flag = True #标记变量，标记是否继续迭代
 
-        #求解
-        while (flag):
+        #求解，沿用分解时第一次迭代使用上一次求解的分解
+        self.loadBuses()
+        self.previous = None
+        self.switches = 0
+        self.violated = False #达到最多轮数后是否仍有节点越限
+        if self.limited.any():
+            #上一次求解中越限的节点恢复为PV节点
+            self.limited[:] = 0
+            self.jacobian.pq = self.model.state.buses.type[self.pvpq] == NodeType.PQ.value
+            self.stale = True
+        factorizations = self.lu.factorizations
+        iterations = 0
+        while (flag and iterations < self.maxIterations):
             flag = self.iterate()#迭代一次
             # input(f"Press Enter to continue[{self.times}]...") #调试用
-            pass
+            iterations += 1
+        self.converged = not flag and not self.violated
+        self.iterations = iterations - 1 if self.converged else iterations
+        self.factorizations = self.lu.factorizations - factorizations
 
-        #计算节点注入功率
-        self.applyPower()
-        #计算支路功率
-        self.calBranchesFlow()
-        print(f"Nodes:")
-        for node in self.model.nodes:
-            print(f"{node}")
+        #将迭代结果写回节点表
+        self.model.state.buses.V = self.V
+
+        with telemetry.phase('post', solver='NewtonCartesian'):
+            #计算节点注入功率
+            self.applyPower()
+            #计算支路功率
+            self.calBranchesFlow()
 
     #一次迭代
     def iterate(self):
-        print(f"\nIterating {self.times}...")
         I = self.calInjectedCurrents() #计算注入电流
         Delta = self.calDelta(I) #计算ΔP,ΔQ，ΔV
 
         #获取Δ的最大值判断是否继续迭代
         maxDelta = np.max(np.abs(Delta)) 
         flag = maxDelta > self.precision
+        #不沿用时每次迭代都重新形成雅可比矩阵；沿用时不平衡量下降不够快才重新形成
+        refresh = not self.reuse or self.stale or (self.previous is not None and maxDelta > self.refreshRatio * self.previous)
+        telemetry.iteration('NewtonCartesian', self.times, maxDelta, refreshed=refresh)
+
+        #收敛后检查PV节点无功限值，有节点越限或恢复时以当前结果为初值继续迭代
+        #达到最多轮数后仍需切换时结果不满足无功限值，记为不收敛
+        if not flag and self.qlimits:
+            S = self.V * np.conj(I)
+            limited = self.limited.copy()
+            if self.model.checkQLimits(S, self.V, limited):
+                if self.switches == self.maxSwitches:
+                    self.violated = True
+                    self.times += 1
+                    return flag
+                self.limited = limited
+                self.switchTypes()
+                flag = True
+                self.times += 1
+                return flag
 
         if flag:
             #迭代，计算Jacobi矩阵，从而求解ΔV
-            Jacob = self.calJacobMatrix(I)
+            Jacob = self.calJacobMatrix(I) if refresh else None
             DV = self.calDeltaV(Jacob, Delta)
             #将ΔV应用于节点
             self.applyDV2Nodes(DV)
+            self.previous = maxDelta
 
         #计数用
         self.times += 1
@@ -66,140 +140,58 @@ class NewtonCartesian:
     #         if node.type == NodeType.PV:
     #             node.Q = (Qmax + Qmin)/2
 
-    #计算支路功率，支路电流，支路损耗
+    #按无功越限状态修改PQ节点标记：越限的PV节点作为PQ节点，无功给定值取限值
+    def switchTypes(self):
+        self.switches += 1
+        lim = self.limited != 0
+        self.S = self.S.real + 1j * np.where(lim, self.model.limitQ(self.limited), self.S.imag)
+        self.jacobian.pq = (self.model.state.buses.type[self.pvpq] == NodeType.PQ.value) | lim[self.pvpq]
+        self.stale = True
+        self.previous = None
+        telemetry.event('qlimits', solver='NewtonCartesian', limited=int(lim.sum()))
+
+    #计算支路功率，支路电流，支路损耗，由模型一次性计算所有支路
     def calBranchesFlow(self):
-        for i, branch in enumerate(self.model.branches):
-            branch.I = (branch.node1.V - branch.node2.V) * branch.Y #支路电流
-
-            branch.Loss = np.abs(branch.I)**2 / branch.Y.conjugate() #支路损耗
-            self.model.loss += branch.Loss #将支路损耗加到总损耗上
+        self.model.calBranchesFlow()
 
-            branch.Flow = branch.node1.V * branch.I.conjugate() #支路功率
-
-    #计算节点缺失的功率
+    #计算节点缺失的功率，由模型一次性计算所有节点的注入功率
     def applyPower(self):
-        for i, node in enumerate(self.model.nodes):
-            S = 0.+0.j
-            if node.type == NodeType.PV:
-                #PV节点，计算缺失的Q
-                for j, node2 in enumerate(self.model.nodes):
-                    S+= (node.V*node2.V)*self.Y[i][j]
-                node.Q = S.imag
-                node.V = P2Complex(node.oV, node.getTheta())
-            if node.type == NodeType.Slack:
-                #平衡节点，计算缺失的P,Q
-                for j, node2 in enumerate(self.model.nodes):
-                    S+= (node.V*node2.V)*self.Y[i][j]
-                node.P = S.real
-                node.Q = S.imag
-            
-            
-    #计算每个节点注入电流
-    def calInjectedCurrents(self):
-        I = np.zeros((self.NodeCount, 1), dtype=complex)
+        self.model.applyPower(self.Y, self.limited)
 
-        #遍历每个节点
-        for i, node in enumerate(self.model.nodes):
-            injectedCurrent = 0
-            subs = self.Y[i]
-            for j, sub in enumerate(subs):
-                injectedCurrent += sub * self.model.nodes[j].V
-
-            I[i] = injectedCurrent
-        print(f"Injected Currents:\n{I}")
-        return I
+    #计算每个节点注入电流 I = Y·V
+    def calInjectedCurrents(self):
+        return self.Y @ self.V
 
-    #计算Jacobi矩阵，需要提供注入电流
+    #计算Jacobi矩阵，需要提供注入电流，返回 -∂(ΔP,ΔQ,ΔV²)/∂(e,f) 的相反数，与 calDeltaV 的符号约定一致
     def calJacobMatrix(self, InjectedCurrents):
-        I = InjectedCurrents
-        MN = self.NodeCount-1 #减去平衡节点
-        H = np.zeros((MN, MN), dtype=float)
-        N = np.zeros((MN, MN), dtype=float)
-        J = np.zeros((MN, MN), dtype=float)
-        L = np.zeros((MN, MN), dtype=float)
-        Jacob = np.zeros(
-            (MN*2, MN*2), dtype=float)
-
-        #遍历矩阵的每一项
-        for i in range(MN):
-            for j in range(MN):
-
-                G, B = self.Y[i][j].real, self.Y[i][j].imag
-                e, f = self.model.nodes[i].V.real, self.model.nodes[i].V.imag
-
-                if(i==1 and j==3):
-                    print(f"Y[{i}][{j}]:{self.Y[i][j]}")
-                    print(f"G:{G}, B:{B}")
-                    print(f"e:{e}, f:{f}")
-                H[i][j] = -(G*e+B*f)
-                N[i][j] = (B*e-G*f)
-                if self.model.nodes[i].type == NodeType.PQ:
-                    J[i][j] = N[i][j]
-                    L[i][j] = -H[i][j]
-                elif self.model.nodes[i].type == NodeType.PV:
-                    J[i][j] = 0
-                    L[i][j] = 0
-
-                if i == j:
-                    a, b = I[i].real, I[i].imag
-                    H[i][j] += -a
-                    N[i][j] += -b
-                    if self.model.nodes[i].type == NodeType.PQ:
-                        J[i][j] += b
-                        L[i][j] += -a
-                    elif self.model.nodes[i].type == NodeType.PV:
-                        J[i][j] = -2*e
-                        L[i][j] = -2*f
-
-                #将四个子矩阵 交叉 填入Jacob矩阵
-                Jacob[2*i][2*j] = J[i][j]
-                Jacob[2*i][2*j+1] = L[i][j]
-                Jacob[2*i+1][2*j] = H[i][j]
-                Jacob[2*i+1][2*j+1] = N[i][j]
-        with np.printoptions(linewidth=180):
-            print(f"Jacob Matrix[{Jacob.shape}]:\n{Jacob}")
-        return Jacob
+        with telemetry.phase('jacobian', solver='NewtonCartesian'):
+            if self.sparse:
+                return -self.jacobian.sparse(self.V, InjectedCurrents)
+            return -self.jacobian.dense(self.V, InjectedCurrents)
 
     #计算DeltaP，DeltaQ，DeltaV^2，最后总结为一个向量，需要提供注入电流
     def calDelta(self, InjectionCurrents):
-        I = InjectionCurrents
-        MN = self.NodeCount-1
-        Delta = np.zeros((MN*2, 1), dtype=float)
-
-        for i in range(MN):
-            
-            #PQ节点,计算DeltaP，DeltaQ
-            if self.model.nodes[i].type == NodeType.PQ:
-                e, f = self.model.nodes[i].V.real, self.model.nodes[i].V.imag
-                a, b = I[i].real, I[i].imag
-                Delta[2*i] = self.model.nodes[i].Q-(f*a-e*b)
-                Delta[2*i+1] = self.model.nodes[i].P-(e*a+f*b)
-
-            #PV节点，计算DeltaP，DeltaV^2
-            elif self.model.nodes[i].type == NodeType.PV:
-                e, f = self.model.nodes[i].V.real, self.model.nodes[i].V.imag
-                a, b = I[i].real, I[i].imag
-                Delta[2*i] = np.abs(self.model.nodes[i].V)**2-(e**2+f**2)
-                Delta[2*i+1] = self.model.nodes[i].P-(e*a+f*b)
-
-        print(f"Delta[{Delta.shape}]:\n{Delta}")
+        V = self.V[self.pvpq]
+        S = V * np.conj(InjectionCurrents[self.pvpq])
+        Sset = self.S[self.pvpq]
+
+        #PQ节点计算DeltaP，DeltaQ；PV节点计算DeltaP，DeltaV^2
+        Delta = np.concatenate([
+            Sset.real - S.real,
+            np.where(self.jacobian.pq, Sset.imag - S.imag, self.Vset[self.pvpq]**2 - np.abs(V)**2),
+        ])
         return Delta
 
-    #计算DeltaV，需要提供Jacobi矩阵和Delta，解方程
+    #计算DeltaV，需要提供Jacobi矩阵和Delta，解方程；Jacob为None时沿用上次的分解
+    #稀疏矩阵使用缓存列排序的稀疏LU分解，稠密矩阵使用LAPACK的LU分解
     def calDeltaV(self, Jacob, Delta):
-        DV = np.linalg.solve(Jacob, Delta) #使用 numpy 所携带的线性方程求解器求解
-
-        print(f"DeltaV[{DV.shape}]:\n{DV}")
-
-        return DV
+        with telemetry.phase('solve', solver='NewtonCartesian'):
+            if Jacob is not None:
+                self.lu.factorize(Jacob)
+                self.stale = False
+            return self.lu.solve(Delta)
 
-    #将计算得到的DeltaV应用到节点上
+    #将计算得到的DeltaV应用到节点电压上
     def applyDV2Nodes(self, DV):
-        for i in range(self.NodeCount-1):
-            e, f = self.model.nodes[i].V.real, self.model.nodes[i].V.imag
-            if self.model.nodes[i].type == NodeType.PQ:
-                self.model.nodes[i].V = (e-DV[2*i])+(f-DV[2*i+1])*1j
-            elif self.model.nodes[i].type == NodeType.PV:
-                self.model.nodes[i].V = (e-DV[2*i])+(f-DV[2*i+1])*1j
-
-        
\ No newline at end of file
+        m = len(self.pvpq)
+        self.V[self.pvpq] -= DV[:m] + DV[m:] * 1j
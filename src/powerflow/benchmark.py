@@ -0,0 +1,172 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import functools
+import numpy as np
+import scipy
+from powerflow.model import Model, Profile
+from powerflow.report import Report
+from powerflow.Newton_Polar import NewtonPolar
+from powerflow.Newton_Cartesian import NewtonCartesian
+from powerflow.Fast_Decoupled import FastDecoupled
+from powerflow.synthetic import generateCases
+from powerflow.telemetry import telemetry, MemorySink
+
+#扩展性基准测试：对每个算例分别计时解析、组建模型、形成节点导纳矩阵、各求解器和结果报告，
+#结果保存为JSON基准文件，与之前的基准文件比较即可发现任一阶段的性能退化
+BENCHMARK_VERSION = 1
+
+SOLVERS = {
+    'NewtonPolar': NewtonPolar,
+    'NewtonCartesian': NewtonCartesian,
+    'FastDecoupled': FastDecoupled,
+    #沿用雅可比矩阵分解的牛顿法
+    'NewtonPolarReuse': functools.partial(NewtonPolar, reuse=True),
+    'NewtonCartesianReuse': functools.partial(NewtonCartesian, reuse=True),
+}
+
+#计时，返回(结果, 耗时)
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+#对一个算例进行测试，返回各阶段耗时
+def benchmarkCase(path, solvers=tuple(SOLVERS), sparse=True):
+    profile, tParse = timed(Profile, path)
+    model = Model()
+    _, tCompose = timed(model.compose, profile)
+    _, tYbus = timed(model.deriveYMatrix, sparse)
+    result = {
+        'case': os.path.basename(path),
+        'buses': len(model.nodes),
+        'branches': len(model.branches),
+        'sparse': sparse,
+        'phases': {'profile': tParse, 'compose': tCompose, 'ybus': tYbus},
+        'solvers': {},
+    }
+
+    for name in solvers:
+        #每个求解器使用新组建的模型，避免上一个求解器的结果作为初值
+        model = Model()
+        model.compose(profile)
+        with telemetry.listen(MemorySink()) as sink:
+            cal, tSetup = timed(SOLVERS[name], model, sparse=sparse)
+            _, tRun = timed(cal.solve)
+        iterations = sink.iterations()
+        result['solvers'][name] = {
+            'setup': tSetup,
+            'run': tRun,
+            'converged': bool(getattr(cal, 'converged', True)),
+            'iterations': getattr(cal, 'iterations', max([record['iteration'] for record in iterations], default=0)),
+            'factorizations': getattr(cal, 'factorizations', 0),
+            'phases': sink.phases(),
+        }
+
+    #结果报告输出到空设备，只计时格式化的开销
+    report = Report(model)
+    with open(os.devnull, 'w') as devnull:
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            _, tReport = timed(lambda: (report.listNodes(), report.listBranches(), report.showTotalLoss()))
+        finally:
+            sys.stdout = stdout
+    result['phases']['report'] = tReport
+    return result
+
+#对一组算例进行测试，返回可写入JSON的基准数据
+def runBenchmark(paths, solvers=tuple(SOLVERS), sparse=True, repeat=1):
+    cases = []
+    for path in paths:
+        #重复测试时每一项取最小耗时
+        runs = [benchmarkCase(path, solvers, sparse) for _ in range(repeat)]
+        cases.append(_minimum(runs))
+    return {
+        'version': BENCHMARK_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'machine': {
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'scipy': scipy.__version__,
+        },
+        'cases': cases,
+    }
+
+#多次测试结果中各耗时项取最小值
+def _minimum(runs):
+    if isinstance(runs[0], dict):
+        return {key: _minimum([run[key] for run in runs]) for key in runs[0]}
+    if isinstance(runs[0], float):
+        return min(runs)
+    return runs[0]
+
+#展开为(算例, 阶段)到耗时的映射，求解器阶段记为'求解器/阶段'
+def flatten(benchmark):
+    timings = {}
+    for case in benchmark['cases']:
+        for phase, seconds in case['phases'].items():
+            timings[(case['case'], phase)] = seconds
+        for solver, values in case['solvers'].items():
+            timings[(case['case'], f'{solver}/setup')] = values['setup']
+            timings[(case['case'], f'{solver}/run')] = values['run']
+            for phase, seconds in values['phases'].items():
+                timings[(case['case'], f'{solver}/{phase}')] = seconds
+    return timings
+
+#与基准比较，耗时超过基准tolerance倍(且绝对差值超过minimum秒)的阶段视为性能退化，返回退化列表
+def compareBaseline(current, baseline, tolerance=1.5, minimum=1e-3):
+    if baseline.get('version') != BENCHMARK_VERSION:
+        raise ValueError('Unsupported benchmark baseline version')
+    now, before = flatten(current), flatten(baseline)
+    regressions = []
+    for key, seconds in now.items():
+        if key not in before:
+            continue
+        if seconds > before[key] * tolerance and seconds - before[key] > minimum:
+            regressions.append({'case': key[0], 'phase': key[1], 'baseline': before[key], 'current': seconds, 'ratio': seconds / before[key]})
+    return regressions
+
+#输出测试结果表
+def printBenchmark(benchmark):
+    print(f"Case\t\tPhase\t\t\tSeconds")
+    for (case, phase), seconds in flatten(benchmark).items():
+        print(f"{case}\t\t{phase}\t\t\t{'%.4f' % seconds}")
+    print()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Power flow scaling benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000], help='synthetic case sizes (buses)')
+    parser.add_argument('--cases', nargs='*', default=[], help='additional .th files')
+    parser.add_argument('--directory', default=os.path.join(tempfile.gettempdir(), 'powerflow-synthetic'), help='where synthetic cases are written')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--solvers', nargs='+', default=list(SOLVERS), choices=list(SOLVERS))
+    parser.add_argument('--dense', action='store_true', help='use dense Y matrices')
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare against this JSON baseline')
+    parser.add_argument('--tolerance', type=float, default=1.5)
+    args = parser.parse_args(argv)
+
+    paths = generateCases(args.sizes, args.directory, seed=args.seed) + args.cases
+    benchmark = runBenchmark(paths, args.solvers, sparse=not args.dense, repeat=args.repeat)
+    printBenchmark(benchmark)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(benchmark, f, indent=1)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compareBaseline(benchmark, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression['case']} {regression['phase']} {'%.4f' % regression['baseline']}s -> {'%.4f' % regression['current']}s (x{'%.2f' % regression['ratio']})")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,104 @@
+import os
+import hashlib
+import warnings
+import numpy as np
+from powerflow.model import Model, Profile, Node, Branch
+
+#编译后的算例缓存，以列存储的形式保存节点、支路数组和名称表，
+#缓存文件名中带有源文件内容的哈希值，源文件不变时直接加载缓存，不再解析文本
+CACHE_VERSION = 1
+
+#节点和支路需要保存的属性
+NODE_FIELDS = ['P', 'Pg', 'Pd', 'Q', 'Qg', 'Qd', 'V', 'oV', 'Pmin', 'Pmax', 'Qmin', 'Qmax', 'Vmin', 'Vmax', 'Ys']
+BRANCH_FIELDS = ['Y', 'Ys1', 'Ys2', 'Irated']
+
+#计算文件内容的哈希值
+def fileHash(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+#源文件对应的缓存文件路径，默认放在源文件所在目录的__thcache__目录下
+def cachePath(path, cacheDir=None, digest=None):
+    if cacheDir is None:
+        cacheDir = os.path.join(os.path.dirname(os.path.abspath(path)), '__thcache__')
+    if digest is None:
+        digest = fileHash(path)
+    return os.path.join(cacheDir, f'{os.path.basename(path)}.{digest[:16]}.npz')
+
+#将模型保存为缓存文件，节点和支路数据直接取自模型的节点表和支路表
+def saveModel(model: Model, path, digest=''):
+    buses, branches = model.state.buses, model.state.branches
+    arrays = {
+        'version': np.array(CACHE_VERSION),
+        'hash': np.array(digest),
+        'node_name': np.array([node.name for node in model.nodes], dtype=str),
+        'node_type': buses.type,
+        'node_canChangeType': buses.canChangeType,
+        'branch_name': np.array([branch.name for branch in model.branches], dtype=str),
+        'branch_from': branches.f,
+        'branch_to': branches.t,
+        'branch_inService': branches.inService,
+    }
+    for field in NODE_FIELDS:
+        arrays['node_' + field] = getattr(buses, field)
+    for field in BRANCH_FIELDS:
+        arrays['branch_' + field] = getattr(branches, field)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    #先写入临时文件再改名，避免并行进程读到写了一半的缓存
+    tmp = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, path)
+    except OSError:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+#从缓存文件加载模型，节点和支路对象建立后整列写入数据
+def loadModel(path) -> Model:
+    with np.load(path, allow_pickle=False) as data:
+        if int(data['version']) != CACHE_VERSION:
+            raise ValueError(f'Unsupported case cache version in {path}')
+        arrays = {key: data[key] for key in data.files}
+
+    model = Model()
+    buses, branches = model.state.buses, model.state.branches
+    nodes = [Node(name, table=buses) for name in arrays['node_name'].tolist()]
+    model.addNodes(*nodes)
+    buses.type = arrays['node_type']
+    buses.canChangeType = arrays['node_canChangeType']
+    for field in NODE_FIELDS:
+        setattr(buses, field, arrays['node_' + field])
+
+    f, t = arrays['branch_from'].tolist(), arrays['branch_to'].tolist()
+    model.addBranches(*[Branch(name, nodes[f[k]], nodes[t[k]], table=branches) for k, name in enumerate(arrays['branch_name'].tolist())])
+    branches.inService = arrays['branch_inService']
+    for field in BRANCH_FIELDS:
+        setattr(branches, field, arrays['branch_' + field])
+    #电气岛与组建模型时相同，由投入运行的支路重新计算
+    model.detectIslands()
+    return model
+
+#读取算例：源文件未改变时加载缓存，否则解析源文件并写入缓存
+def loadCase(path, cacheDir=None) -> Model:
+    digest = fileHash(path)
+    cache = cachePath(path, cacheDir, digest)
+    if os.path.exists(cache):
+        try:
+            return loadModel(cache)
+        except (OSError, ValueError, KeyError):
+            pass
+
+    model = Model()
+    model.compose(Profile(path))
+    #缓存目录不可写（只读目录、磁盘已满等）时只给出警告，解析得到的模型照常返回
+    try:
+        saveModel(model, cache, digest=digest)
+    except OSError as e:
+        warnings.warn(f'Could not write case cache {cache}: {e}', RuntimeWarning)
+    return model
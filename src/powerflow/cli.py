@@ -0,0 +1,191 @@
+import os
+import sys
+import csv
+import time
+import argparse
+import importlib
+
+#批量计算命令行：对多个.th算例(或目录下的所有算例)并行求解，输出各算例的结果文件和耗时汇总
+#numpy、scipy和求解器模块只在求解时导入，--help和算例检查不需要加载它们
+#用法：python -m powerflow.cli ../tests --solver NewtonPolar --jobs 4 --output results
+
+#求解器名称到(模块, 类名, 参数)的映射，求解时再导入
+SOLVERS = {
+    'NewtonPolar': ('powerflow.Newton_Polar', 'NewtonPolar', {}),
+    'NewtonCartesian': ('powerflow.Newton_Cartesian', 'NewtonCartesian', {}),
+    'FastDecoupled': ('powerflow.Fast_Decoupled', 'FastDecoupled', {}),
+    'FastDecoupledBX': ('powerflow.Fast_Decoupled', 'FastDecoupled', {'variant': 'BX'}),
+    'DCPowerFlow': ('powerflow.DC_PowerFlow', 'DCPowerFlow', {}),
+}
+
+#汇总表的列
+SUMMARY_FIELDS = ['case', 'buses', 'branches', 'converged', 'iterations', 'load', 'solve', 'export', 'total', 'error']
+
+#按名称创建求解器
+def createSolver(name, model, sparse, qlimits=False):
+    module, cls, kwargs = SOLVERS[name]
+    solver = getattr(importlib.import_module(module), cls)
+    if qlimits:
+        kwargs = dict(kwargs, qlimits=True)
+    return solver(model, sparse=sparse, **kwargs)
+
+#由命令行参数得到算例文件列表，目录中按文件名顺序取所有.th文件，参数有误时抛出ValueError
+def collectCases(paths, recursive=False):
+    cases = []
+    for path in paths:
+        if os.path.isdir(path):
+            if recursive:
+                found = [os.path.join(directory, name) for directory, _, names in os.walk(path) for name in names if name.lower().endswith('.th')]
+            else:
+                found = [os.path.join(path, name) for name in os.listdir(path) if name.lower().endswith('.th')]
+            if not found:
+                raise ValueError(f'No .th cases in {path}')
+            cases.extend(sorted(found))
+        elif os.path.isfile(path):
+            cases.append(path)
+        else:
+            raise ValueError(f'No such case file or directory: {path}')
+
+    #结果文件以算例名命名，不同目录下的同名算例会互相覆盖
+    names = {}
+    for path in cases:
+        name = caseName(path)
+        if name in names and os.path.abspath(names[name]) != os.path.abspath(path):
+            raise ValueError(f'Duplicate case name {name}: {names[name]} and {path}')
+        names[name] = path
+    return list(dict.fromkeys(os.path.abspath(path) for path in cases))
+
+def caseName(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+#求解一个算例，返回汇总表的一行；options为命令行参数中与求解有关的部分
+#output不为None时将节点和支路结果写入该目录；report为True时返回文本形式的结果报告
+def solveCase(path, options):
+    import io
+    import contextlib
+    from powerflow.cache import loadCase
+    from powerflow.model import Model, Profile
+    from powerflow.report import Report
+
+    result = dict.fromkeys(SUMMARY_FIELDS, '')
+    result.update(case=caseName(path), converged=False, error='')
+    start = time.perf_counter()
+    try:
+        if options['cache']:
+            model = loadCase(path)
+        else:
+            model = Model()
+            model.compose(Profile(path))
+        model.ordering = options['ordering']
+        loaded = time.perf_counter()
+        result.update(buses=len(model.nodes), branches=len(model.branches), load=loaded - start)
+
+        cal = createSolver(options['solver'], model, options['sparse'], options['qlimits'])
+        cal.solve()
+        solved = time.perf_counter()
+        result.update(converged=bool(getattr(cal, 'converged', True)), iterations=int(getattr(cal, 'iterations', 0)), solve=solved - loaded)
+
+        report = Report(model)
+        if options['output'] is not None:
+            prefix = os.path.join(options['output'], result['case'])
+            report.exportNodes(f"{prefix}.nodes.{options['format']}")
+            report.exportBranches(f"{prefix}.branches.{options['format']}")
+        if options['report']:
+            text = io.StringIO()
+            with contextlib.redirect_stdout(text):
+                report.listNodes()
+                report.listBranches()
+                report.showTotalLoss()
+            result['report'] = text.getvalue()
+        result['export'] = time.perf_counter() - solved
+    except Exception as e:
+        result['error'] = f'{type(e).__name__}: {e}'
+    result['total'] = time.perf_counter() - start
+    return result
+
+#并行求解所有算例，按输入顺序逐个产生结果；jobs为1或只有一个算例时在当前进程中计算
+def solveCases(cases, options, jobs=None):
+    if jobs == 1 or len(cases) == 1:
+        for path in cases:
+            yield solveCase(path, options)
+        return
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        yield from pool.map(solveCase, cases, [options] * len(cases))
+
+#输出汇总表的一行
+def formatRow(result):
+    def seconds(value):
+        return '%.4f' % value if value != '' else '-'
+    status = 'True' if result['converged'] else ('Error' if result['error'] else 'False')
+    return f"{result['case']}\t{result['buses']}\t{result['branches']}\t{status}\t{result['iterations']}\t" \
+           f"{seconds(result['load'])}\t{seconds(result['solve'])}\t{seconds(result['export'])}\t{seconds(result['total'])}"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m powerflow.cli', description='Solve a batch of .th power flow cases')
+    parser.add_argument('cases', nargs='+', help='.th files or directories containing them')
+    parser.add_argument('-r', '--recursive', action='store_true', help='search directories recursively')
+    parser.add_argument('-s', '--solver', default='NewtonPolar', choices=list(SOLVERS))
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('-o', '--output', help='write per-case node/branch results and summary.csv to this directory')
+    parser.add_argument('--format', default='csv', choices=['csv', 'parquet', 'npz'], help='per-case result format')
+    parser.add_argument('--dense', action='store_true', help='use dense Y matrices')
+    parser.add_argument('--ordering', choices=['rcm', 'degree'], help='bus ordering within each bus type; B matrices of DC/fast decoupled are then factorized in this order')
+    parser.add_argument('--qlimits', action='store_true', help='enforce generator Q limits (Newton solvers)')
+    parser.add_argument('--no-cache', dest='cache', action='store_false', help='always parse the .th files')
+    parser.add_argument('--report', action='store_true', help='print (or with --output, save) the full node/branch report')
+    parser.add_argument('--check', action='store_true', help='only validate the case list and exit')
+    args = parser.parse_args(argv)
+
+    if args.jobs is not None and args.jobs < 1:
+        parser.error('--jobs must be at least 1')
+    if args.qlimits and not args.solver.startswith('Newton'):
+        parser.error('--qlimits is only supported by the Newton solvers')
+    try:
+        cases = collectCases(args.cases, args.recursive)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.check:
+        for path in cases:
+            print(path)
+        return 0
+
+    if args.output is not None:
+        os.makedirs(args.output, exist_ok=True)
+    options = {
+        'solver': args.solver, 'sparse': not args.dense, 'ordering': args.ordering, 'qlimits': args.qlimits,
+        'cache': args.cache, 'output': args.output, 'format': args.format, 'report': args.report,
+    }
+
+    start = time.perf_counter()
+    results = []
+    print(f"Case\tBuses\tBranches\tConverged\tIterations\tLoad\tSolve\tExport\tTotal")
+    for result in solveCases(cases, options, args.jobs):
+        results.append(result)
+        print(formatRow(result), flush=True)
+        if result['error']:
+            print(f"  {result['error']}", file=sys.stderr)
+        report = result.pop('report', None)
+        if report is not None:
+            if args.output is None:
+                print(report)
+            else:
+                with open(os.path.join(args.output, f"{result['case']}.txt"), 'w', encoding='utf-8') as f:
+                    f.write(report)
+    wall = time.perf_counter() - start
+
+    failed = [result['case'] for result in results if not result['converged']]
+    cpu = sum(result['total'] for result in results)
+    print(f"Cases: {len(results)}\tFailed: {len(failed)}\tWall: {'%.4f' % wall}s\tSum of case times: {'%.4f' % cpu}s")
+    if failed:
+        print(f"Not converged: {' '.join(failed)}")
+
+    if args.output is not None:
+        with open(os.path.join(args.output, 'summary.csv'), 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS)
+            writer.writeheader()
+            writer.writerows(results)
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
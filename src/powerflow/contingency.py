@@ -0,0 +1,161 @@
+import itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from powerflow.model import Model
+from powerflow.Newton_Polar import NewtonPolar
+from powerflow.DC_PowerFlow import DCPowerFlow
+
+#N-1/N-2 预想事故分析，每个事故将支路退出运行后以基态潮流为初值求解
+class ContingencyAnalysis:
+    #model为已组建的模型，solver为求解器类，processes为进程数(1表示在当前进程中计算)
+    def __init__(self, model: Model, solver=NewtonPolar, sparse=False, processes=None):
+        self.model = model
+        self.solver = solver
+        self.sparse = sparse
+        self.processes = processes
+
+    #求解基态潮流，作为各事故的初值
+    def solveBase(self):
+        cal = self.solver(self.model, sparse=self.sparse)
+        cal.solve()
+        self.nodeNames = [node.name for node in self.model.nodes]
+        self.branchNames = [branch.name for branch in self.model.branches]
+        state = self.model.state
+        self.Irated = state.branches.Irated.copy()
+        self.baseV = np.abs(state.buses.V)
+
+    #生成事故列表，order为同时退出的支路数
+    def outages(self, order=1, names=None):
+        if names is None:
+            names = [branch.name for branch in self.model.branches if branch.inService]
+        return list(itertools.combinations(names, order))
+
+    #以直流潮流的开断分布因子筛选N-1事故，返回开断后有支路负载率(|P|/Irated)超过threshold或网络解列的事故，
+    #未给定额定电流的支路不参与负载率判断；筛选出的事故再用run(outages)进行交流潮流校核
+    def screen(self, threshold=1.0, names=None):
+        model = self.model
+        dc = DCPowerFlow(model, sparse=self.sparse)
+        model.listeners.discard(dc)
+        if names is None:
+            names = [branch.name for branch in model.branches if branch.inService]
+        index = np.array([model.branchIndex[name] for name in names], dtype=int)
+
+        P = model.state.buses.P.copy()
+        P[dc.slack] = 0
+        flow = dc.calFlow(dc.calTheta(P))
+        after = dc.screenOutages(index, flow)
+        #开断后网络解列时开断分布因子为nan
+        islanding = np.isnan(after).any(axis=0)
+        Irated = model.state.branches.Irated
+        rated = Irated > 0
+        loading = np.full(after.shape, np.nan)
+        with np.errstate(invalid='ignore'):
+            loading[rated] = np.abs(after[rated]) / Irated[rated, None]
+        #各事故后额定支路的最大负载率，fmax忽略nan
+        overloaded = np.fmax.reduce(loading[rated], axis=0, initial=-np.inf) > threshold
+        flagged = islanding | overloaded
+        #各事故后的支路负载率(支路数×事故数)，未给定额定电流的支路和网络解列时为nan
+        self.screenLoading = loading
+        return [(names[k],) for k in np.flatnonzero(flagged)]
+
+    #逐个事故求解，返回结果表
+    def run(self, outages=None, order=1):
+        self.solveBase()
+        if outages is None:
+            outages = self.outages(order)
+        outages = [tuple(outage) for outage in outages]
+
+        if self.processes == 1:
+            #在当前进程中直接修改模型求解，结束后恢复基态结果，与多进程时模型不变一致
+            model = self.model
+            buses, branches = model.state.buses, model.state.branches
+            base = {table: {name: getattr(table, name).copy() for name in names}
+                    for table, names in ((buses, ('V', 'P', 'Q', 'Pg', 'Qg')), (branches, ('I', 'Flow', 'Loss')))}
+            loss = model.loss
+            _initWorker(model, self.solver, self.sparse)
+            try:
+                results = [_solveOutage(outage) for outage in outages]
+            finally:
+                #求解器不再作为模型的监听者
+                _worker.clear()
+                for table, columns in base.items():
+                    for name, values in columns.items():
+                        setattr(table, name, values)
+                model.loss = loss
+        else:
+            with ProcessPoolExecutor(max_workers=self.processes, initializer=_initWorker,
+                                     initargs=(self.model, self.solver, self.sparse)) as pool:
+                results = list(pool.map(_solveOutage, outages, chunksize=max(1, len(outages) // 64)))
+
+        #结果表：每个事故一行，节点电压幅值和支路负载率(|I|/Irated，未给定额定电流的支路为nan)各为一个矩阵
+        self.outageList = outages
+        self.converged = np.array([result[0] for result in results], dtype=bool)
+        self.V = np.array([result[1] for result in results]).reshape(len(outages), len(self.nodeNames))
+        self.loading = np.array([result[2] for result in results]).reshape(len(outages), len(self.branchNames))
+        return self
+
+    #输出事故分析结果，每个事故列出最低电压节点和最重载支路
+    def listContingencies(self):
+        print(f"Outage\t\tConverged\tVmin\tNode\tLoadingMax\tBranch")
+        for k, outage in enumerate(self.outageList):
+            if not self.converged[k]:
+                print(f"{'+'.join(outage)}\t\tFalse")
+                continue
+            i = np.argmin(self.V[k])
+            if np.isnan(self.loading[k]).all():
+                print(f"{'+'.join(outage)}\t\tTrue\t\t{'%.4f' % self.V[k, i]}\t{self.nodeNames[i]}\t-\t\t-")
+                continue
+            j = np.nanargmax(self.loading[k])
+            print(f"{'+'.join(outage)}\t\tTrue\t\t{'%.4f' % self.V[k, i]}\t{self.nodeNames[i]}\t{'%.2f' % self.loading[k, j]}\t\t{self.branchNames[j]}")
+        print()
+
+#支路负载率 |I|/Irated，未给定额定电流(Irated为零)的支路为nan
+def branchLoading(I, Irated):
+    loading = np.full(len(Irated), np.nan)
+    rated = Irated > 0
+    loading[rated] = np.abs(I[rated]) / Irated[rated]
+    return loading
+
+#工作进程中的模型、求解器和基态数据，每个进程只建立一次；
+#各事故通过Model.switchBranch局部修改导纳矩阵，求解器随之更新，不重新形成导纳矩阵
+_worker = {}
+
+def _initWorker(model, solver, sparse):
+    _worker['model'] = model
+    buses = model.state.buses
+    _worker['base'] = (buses.V.copy(), buses.P.copy(), buses.Q.copy())
+    _worker['cal'] = solver(model, sparse=sparse)
+    _worker['islands'] = (model.detectIslands().copy(), model.islandCount)
+
+#求解一个事故，返回(是否收敛, 节点电压幅值, 支路负载率)；开断后网络解列的事故不求解，记为不收敛
+def _solveOutage(outage):
+    model, cal = _worker['model'], _worker['cal']
+
+    #恢复基态节点数据作为初值
+    buses = model.state.buses
+    buses.V, buses.P, buses.Q = _worker['base']
+
+    switched = [] #已退出运行的支路及其原来的投退状态
+    try:
+        for name in outage:
+            switched.append((name, model.branchDict[name].inService))
+            model.switchBranch(name, False)
+        model.detectIslands()
+        if model.islandCount > _worker['islands'][1]:
+            converged = False
+        else:
+            cal.solve()
+            converged = getattr(cal, 'converged', True)
+    except (np.linalg.LinAlgError, RuntimeError):
+        #雅可比矩阵奇异，记为不收敛
+        converged = False
+    finally:
+        for name, inService in switched:
+            model.switchBranch(name, inService)
+        model.islands, model.islandCount = _worker['islands']
+
+    n, m = len(model.nodes), len(model.branches)
+    if not converged:
+        return False, np.full(n, np.nan), np.full(m, np.nan)
+    state = model.state
+    return True, np.abs(state.buses.V), branchLoading(state.branches.I, state.branches.Irated)
@@ -0,0 +1,112 @@
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from powerflow.model import Model, Node, Branch, NodeType
+from powerflow.state import BUS_COLUMNS, BRANCH_COLUMNS
+from powerflow.Newton_Polar import NewtonPolar
+from powerflow.telemetry import telemetry
+
+#电气岛分析：支路退出运行后网络可能分裂为多个电气岛，孤立的节点使雅可比矩阵奇异。
+#没有平衡节点和PV节点的电气岛停电(电压、功率置零)；只有PV节点的电气岛以最大出力上限的PV节点作为平衡节点；
+#其余各岛分别组建为独立的小模型，在线程池中并行求解，结果写回原模型，一个岛不收敛不影响其他岛
+class IslandAnalysis:
+    #model为已组建的模型，solver为求解器类，threads为线程数(1表示在当前线程中依次计算)
+    def __init__(self, model: Model, solver=NewtonPolar, sparse=False, threads=None):
+        self.model = model
+        self.solver = solver
+        self.sparse = sparse
+        self.threads = threads
+
+    #划分电气岛并分别求解
+    def run(self):
+        model = self.model
+        buses, branches = model.state.buses, model.state.branches
+        with telemetry.phase('islands'):
+            labels = model.detectIslands()
+            types = buses.type
+            slack = np.bincount(labels, types == NodeType.Slack.value, model.islandCount) > 0
+            pv = np.bincount(labels, types == NodeType.PV.value, model.islandCount) > 0
+
+            self.labels = labels
+            self.energized = (slack | pv)[labels] #节点是否带电
+            self.islandSlack = {} #以PV节点作为平衡节点的电气岛，岛编号到节点名称
+            live = [k for k in range(model.islandCount) if slack[k] or pv[k]]
+            problems = [self.extract(np.flatnonzero(labels == k), k, not slack[k]) for k in live]
+
+        #停电的节点和两端不在同一带电岛内的支路
+        dead = ~self.energized
+        buses.V[dead] = 0
+        for name in ('P', 'Q', 'Pg', 'Qg'):
+            getattr(buses, name)[dead] = 0
+        idle = dead[branches.f] | dead[branches.t] | (labels[branches.f] != labels[branches.t])
+        for name in ('I', 'Flow', 'Loss'):
+            getattr(branches, name)[idle] = 0
+
+        if self.threads == 1 or len(problems) <= 1:
+            results = [self.solveIsland(problem) for problem in problems]
+        else:
+            with ThreadPoolExecutor(max_workers=self.threads) as pool:
+                results = list(pool.map(self.solveIsland, problems))
+
+        #各岛结果写回原模型
+        self.converged = np.ones(model.islandCount, dtype=bool)
+        model.loss = 0j
+        for k, (sub, busIndex, branchIndex), converged in zip(live, problems, results):
+            self.converged[k] = converged
+            rows = busIndex[sub.permutation] if len(sub.permutation) == len(busIndex) else busIndex
+            for name in ('V', 'P', 'Q', 'Pg', 'Qg'):
+                getattr(buses, name)[rows] = getattr(sub.state.buses, name)
+            for name in ('I', 'Flow', 'Loss'):
+                getattr(branches, name)[branchIndex] = getattr(sub.state.branches, name)
+            if converged:
+                model.loss += sub.loss
+        telemetry.event('islands', count=model.islandCount, energized=len(live), converged=int(self.converged[live].sum()))
+        return self
+
+    #将一个电气岛的节点(序号buses)和两端都在岛内的支路复制为独立的模型，返回(模型, 节点序号, 支路序号)
+    #promote为True时岛内没有平衡节点，出力上限最大的PV节点在小模型中作为平衡节点
+    def extract(self, busIndex, island, promote=False):
+        model = self.model
+        buses, branches = model.state.buses, model.state.branches
+        local = np.full(len(model.nodes), -1, dtype=np.int64)
+        local[busIndex] = np.arange(len(busIndex))
+        branchIndex = np.flatnonzero((local[branches.f] >= 0) & (local[branches.t] >= 0))
+
+        sub = Model()
+        sub.ordering = model.ordering
+        nodes = [Node(model.nodes[i].name, table=sub.state.buses) for i in busIndex.tolist()]
+        sub.addNodes(*nodes)
+        for name in BUS_COLUMNS:
+            sub.state.buses.data[name][:len(busIndex)] = buses.data[name][busIndex]
+        f, t = local[branches.f[branchIndex]].tolist(), local[branches.t[branchIndex]].tolist()
+        sub.addBranches(*[Branch(model.branches[k].name, nodes[f[j]], nodes[t[j]], table=sub.state.branches) for j, k in enumerate(branchIndex.tolist())])
+        for name in BRANCH_COLUMNS:
+            if name not in ('f', 't'):
+                sub.state.branches.data[name][:len(branchIndex)] = branches.data[name][branchIndex]
+
+        if promote:
+            subBuses = sub.state.buses
+            candidates = np.flatnonzero(subBuses.type == NodeType.PV.value)
+            i = candidates[np.argmax(subBuses.Pmax[candidates])]
+            subBuses.type[i] = NodeType.Slack.value
+            self.islandSlack[island] = nodes[i].name
+        return sub, busIndex, branchIndex
+
+    #求解一个电气岛，返回是否收敛
+    def solveIsland(self, problem):
+        sub = problem[0]
+        try:
+            cal = self.solver(sub, sparse=self.sparse)
+            cal.solve()
+            return bool(getattr(cal, 'converged', True))
+        except (np.linalg.LinAlgError, RuntimeError):
+            return False
+
+    #输出电气岛信息
+    def listIslands(self):
+        print(f"Island\tBuses\tEnergized\tConverged\tSlack")
+        for k in range(self.model.islandCount):
+            members = np.flatnonzero(self.labels == k)
+            energized = bool(self.energized[members[0]])
+            slack = self.islandSlack.get(k, '')
+            print(f"{k}\t{len(members)}\t{energized}\t\t{bool(self.converged[k]) if energized else ''}\t\t{slack}")
+        print()
@@ -0,0 +1,81 @@
+import numpy as np
+import scipy.sparse as sp
+
+#雅可比矩阵结构，只在节点导纳矩阵的非零结构上生成
+#未知量和方程都按 [有功部分(非平衡节点), 无功部分(非平衡节点)] 分成两块，
+#PV节点的无功方程由子类以电压方程代替，这样节点类型改变时矩阵结构保持不变
+class Jacobian:
+    #Y为节点导纳矩阵(稠密或稀疏)，pvpq为非平衡节点序号，pq为与pvpq等长的PQ节点标记
+    def __init__(self, Y, pvpq, pq):
+        self.n = Y.shape[0]
+        self.pvpq = np.asarray(pvpq, dtype=int)
+        self.m = m = len(self.pvpq)
+        self.pq = np.asarray(pq, dtype=bool).copy()
+
+        #节点序号到未知量位置的映射，平衡节点为-1
+        pos = -np.ones(self.n, dtype=int)
+        pos[self.pvpq] = np.arange(m)
+
+        #保留行列均为非平衡节点的导纳元素
+        Ycoo = sp.coo_matrix(Y)
+        keep = (pos[Ycoo.row] >= 0) & (pos[Ycoo.col] >= 0)
+        self.r = Ycoo.row[keep]
+        self.c = Ycoo.col[keep]
+        self.y = Ycoo.data[keep]
+        self.pr = pr = pos[self.r]
+        pc = pos[self.c]
+        k = np.arange(m)
+
+        #四个子块的导纳元素项和对角项，顺序与values()中的数值一一对应
+        rows = np.concatenate([pr, pr, m + pr, m + pr, k, k, m + k, m + k])
+        cols = np.concatenate([pc, m + pc, pc, m + pc, k, m + k, k, m + k])
+
+        #按(列, 行)排序去重，直接得到CSC结构，重复项通过汇总矩阵相加
+        size = 2 * m
+        keys = cols.astype(np.int64) * size + rows
+        uniq, inv = np.unique(keys, return_inverse=True)
+        self.indices = (uniq % size).astype(np.int32)
+        self.indptr = np.concatenate([[0], np.cumsum(np.bincount(uniq // size, minlength=size))]).astype(np.int32)
+        self.A = sp.csr_matrix((np.ones(len(keys)), (inv, np.arange(len(keys)))), shape=(len(uniq), len(keys)))
+        self.shape = (size, size)
+
+    #按__init__中的顺序返回各项数值，由子类实现
+    def values(self, V, S):
+        raise NotImplementedError
+
+    #汇总重复项后得到CSC数据数组，批量计算时每个场景一行，各行连续存储
+    def data(self, V, S):
+        return np.ascontiguousarray((self.A @ self.values(V, S).T).T)
+
+    #返回CSC格式的稀疏雅可比矩阵
+    def sparse(self, V, S):
+        return sp.csc_matrix((self.data(V, S), self.indices, self.indptr), shape=self.shape)
+
+    #返回稠密雅可比矩阵
+    def dense(self, V, S):
+        return self.sparse(V, S).toarray()
+
+#极坐标雅可比矩阵，未知量为 [Δθ, ΔV/V]，方程为 [ΔP, ΔQ]，PV节点的ΔQ方程以单位行(ΔV/V=0)代替
+class PolarJacobian(Jacobian):
+    #计算雅可比矩阵非零元素的数值，V为节点电压(可带前置批量维度)，S为对应的节点注入功率
+    def values(self, V, S):
+        t = V[..., self.r] * np.conj(self.y * V[..., self.c])
+        Sd = S[..., self.pvpq]
+        wq = self.pq.astype(float)
+        return np.concatenate([
+            t.imag, t.real, -t.real * wq[self.pr], t.imag * wq[self.pr],
+            -Sd.imag, Sd.real, Sd.real * wq, Sd.imag * wq + (1. - wq),
+        ], axis=-1)
+
+#直角坐标雅可比矩阵，未知量为 [Δe, Δf]，方程为 [ΔP, ΔQ]，PV节点的ΔQ方程以ΔV²方程代替
+class CartesianJacobian(Jacobian):
+    #计算雅可比矩阵非零元素的数值，V为节点电压(可带前置批量维度)，I为节点注入电流
+    def values(self, V, I):
+        u = V[..., self.r] * np.conj(self.y)
+        Vd = V[..., self.pvpq]
+        Id = I[..., self.pvpq]
+        wq = self.pq.astype(float)
+        return np.concatenate([
+            u.real, u.imag, u.imag * wq[self.pr], -u.real * wq[self.pr],
+            Id.real, Id.imag, -Id.imag * wq + 2 * Vd.real * (1. - wq), Id.real * wq + 2 * Vd.imag * (1. - wq),
+        ], axis=-1)
@@ -0,0 +1,112 @@
+import numpy as np
+import scipy.sparse as sp
+import scipy.linalg
+from scipy.sparse.linalg import splu
+
+#稀疏LU分解，缓存第一次分解得到的列排序，
+#牛顿迭代中雅可比矩阵结构不变，之后的分解按该排序重排各列后直接数值分解，不再计算列排序
+#(SuperLU不能复用符号分解，复用的只是列排序)
+class SparseLU:
+    def __init__(self, permc_spec='COLAMD'):
+        self.permc_spec = permc_spec
+        self.q = None #缓存的列排序
+        self.lu = None
+        self.permuted = False #lu是否为按q重排各列后的矩阵的分解
+        self.factorizations = 0 #分解次数
+
+    #对矩阵A进行数值分解
+    def factorize(self, A):
+        A = sp.csc_matrix(A)
+        if self.q is None:
+            #第一次分解计算列排序，分解结果直接使用
+            self.lu = splu(A, permc_spec=self.permc_spec)
+            #Pr A Pc = L U，Pc对应的列顺序为argsort(perm_c)
+            self.q = np.argsort(self.lu.perm_c)
+            self.permuted = False
+        else:
+            self.lu = splu(A[:, self.q], permc_spec='NATURAL')
+            self.permuted = True
+        self.factorizations += 1
+        return self
+
+    #使用最近一次的分解求解 A x = b
+    def solve(self, b):
+        y = self.lu.solve(b)
+        if not self.permuted:
+            return y
+        x = np.empty_like(y)
+        x[self.q] = y
+        return x
+
+#稠密LU分解，接口与SparseLU相同
+class DenseLU:
+    def __init__(self):
+        self.lu = None
+        self.factorizations = 0 #分解次数
+
+    #对矩阵A进行数值分解
+    def factorize(self, A):
+        self.lu = scipy.linalg.lu_factor(A)
+        self.factorizations += 1
+        return self
+
+    #使用最近一次的分解求解 A x = b
+    def solve(self, b):
+        return scipy.linalg.lu_solve(self.lu, b)
+
+#带低秩修正的LU分解(Sherman–Morrison–Woodbury)
+#矩阵A被修改为 A + E D E^T 时不重新分解，而是在求解时修正基准分解的结果，
+#累计修正的秩超过maxRank时再重新分解
+class WoodburyLU:
+    #lu为SparseLU或DenseLU对象，A为待分解矩阵
+    def __init__(self, lu, A, maxRank=32):
+        self.base = lu
+        self.maxRank = maxRank
+        self.A = A.tolil() if sp.issparse(A) else np.array(A, dtype=float)
+        self.refactorize()
+
+    #重新分解当前矩阵并清空修正项
+    def refactorize(self):
+        A = self.A.tocsc() if sp.issparse(self.A) else self.A
+        self.base.factorize(A)
+        self.idx = np.zeros(0, dtype=int) #修正涉及的行列序号
+        self.D = np.zeros((0, 0)) #分块对角的修正系数
+        self.W = np.zeros((self.A.shape[0], 0)) #A0^{-1} E
+        self.K = None
+
+    @property
+    def factorizations(self):
+        return self.base.factorizations
+
+    #A += E[:, idx] D E[:, idx]^T，idx为行列序号，D为对应的小矩阵
+    def update(self, idx, D):
+        idx = np.asarray(idx, dtype=int)
+        D = np.asarray(D, dtype=float)
+        if len(idx) == 0 or not np.any(D):
+            return
+        for a, i in enumerate(idx):
+            for b, j in enumerate(idx):
+                self.A[i, j] += D[a, b]
+
+        if len(self.idx) + len(idx) > self.maxRank:
+            self.refactorize()
+            return
+
+        E = np.zeros((self.A.shape[0], len(idx)))
+        E[idx, np.arange(len(idx))] = 1.
+        self.W = np.hstack([self.W, self.base.solve(E).reshape(-1, len(idx))])
+        self.idx = np.concatenate([self.idx, idx])
+        r = len(self.idx)
+        Dall = np.zeros((r, r))
+        Dall[:r - len(idx), :r - len(idx)] = self.D
+        Dall[r - len(idx):, r - len(idx):] = D
+        self.D = Dall
+        #(A0 + E D E^T)^{-1} = A0^{-1} - W (I + D E^T W)^{-1} D E^T A0^{-1}
+        self.K = np.eye(r) + self.D @ self.W[self.idx]
+
+    #求解 A x = b
+    def solve(self, b):
+        x = self.base.solve(b)
+        if len(self.idx) == 0:
+            return x
+        return x - self.W @ np.linalg.solve(self.K, self.D @ x[self.idx])
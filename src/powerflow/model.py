@@ -1,9 +1,15 @@
 import os
+import weakref
+import warnings
 import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import reverse_cuthill_mckee, connected_components
 from enum import Enum
 
 from powerflow.component import Component
 from powerflow.utils import P2C, P2Complex
+from powerflow.telemetry import telemetry
+from powerflow.state import NetworkState, Row, Column, BUS_COLUMNS, BRANCH_COLUMNS
 
 global Sb
 Sb = 100
@@ -14,36 +20,70 @@ class NodeType(Enum):
     PV = 2
     Slack = 3 #平衡节点
 
-#节点模型
+_NODE_TYPES = {type.value: type for type in NodeType}
+
+#节点模型，节点数据保存在模型的节点表(NetworkState.buses)中，节点对象只是其中一行的视图
+#未加入模型的节点使用单独的一行数据，加入模型时复制到模型的节点表中
 class Node:
-    def __init__(self, name, type=NodeType.PQ, P=.0, Q=.0, V=1.+0j, Ys=.0+.0j, theta=0., canChangeType=True):
+    __slots__ = ('name', 'table', 'index', 'connectedBranches')
+
+    P = Column('P') #节点总有功功率
+    Pg = Column('Pg') #节点发电机有功功率
+    Pd = Column('Pd') #节点负荷有功功率
+    Q = Column('Q') #节点总无功功率
+    Qg = Column('Qg') #节点发电机无功功率
+    Qd = Column('Qd') #节点负荷无功功率
+    V = Column('V') #节点电压
+    oV = Column('oV') #原始节点电压幅值
+    #节点功率和节点电压的最小值和最大值
+    Pmin = Column('Pmin')
+    Pmax = Column('Pmax')
+    Qmin = Column('Qmin')
+    Qmax = Column('Qmax')
+    Vmin = Column('Vmin')
+    Vmax = Column('Vmax')
+    Ys = Column('Ys') #节点自导纳
+    canChangeType = Column('canChangeType') #是否可以改变节点类型
+
+    def __init__(self, name, type=NodeType.PQ, P=.0, Q=.0, V=1.+0j, Ys=.0+.0j, theta=0., canChangeType=True, table=None):
         self.name = name
-        self.type = type #节点类型，默认是PQ节点
-        self.canChangeType = canChangeType #是否可以改变节点类型
-
-        self.P = P #节点总有功功率
-        self.Pg = P #节点发电机有功功率
-        self.Pd = 0. #节点负荷有功功率
-        self.Q = Q #节点总无功功率
-        self.Qg = Q #节点发电机无功功率
-        self.Qd = 0. #节点负荷无功功率
-        self.V = P2Complex(V, theta) #节点电压
-        self.oV = V #原始节点电压幅值
-
-        #节点功率和节点电压的最小值和最大值
-        self.Pmin = -99999./Sb 
-        self.Pmax = 99999./Sb
-        self.Qmin = -99999./Sb
-        self.Qmax = 99999./Sb
-        self.Vmin = 0.
-        self.Vmax = 100.
-
-        #节点自导纳
-        self.Ys = Ys
+        row = {
+            'type': type.value, #节点类型，默认是PQ节点
+            'canChangeType': canChangeType,
+            'P': P, 'Pg': P, 'Pd': 0.,
+            'Q': Q, 'Qg': Q, 'Qd': 0.,
+            'V': P2Complex(V, theta), 'oV': V,
+            'Pmin': -99999./Sb, 'Pmax': 99999./Sb,
+            'Qmin': -99999./Sb, 'Qmax': 99999./Sb,
+            'Vmin': 0., 'Vmax': 100.,
+            'Ys': Ys,
+        }
+        #table为模型的节点表时直接在其中添加一行
+        if table is not None:
+            self.table, self.index = table, table.append(row)
+        else:
+            self.table, self.index = Row(BUS_COLUMNS, row), 0
 
         #节点所连接的支路
         self.connectedBranches = []
 
+    #节点类型
+    @property
+    def type(self):
+        return _NODE_TYPES[int(self.table.data['type'][self.index])]
+
+    @type.setter
+    def type(self, type):
+        self.table.data['type'][self.index] = type.value
+
+    #序列化时不保存所连接的支路，由支路反序列化时重新连接，避免沿网络拓扑递归过深
+    def __getstate__(self):
+        return self.name, self.table, self.index
+
+    def __setstate__(self, state):
+        self.name, self.table, self.index = state
+        self.connectedBranches = []
+
     #V 是复数，计算相角需要一步转换
     def getTheta(self):
         return np.angle(self.V)
@@ -64,32 +104,42 @@ class Node:
     def connect(self, branch):
         self.connectedBranches.append(branch)
 
-    #计算节点未确定的功率，如PV和Slack节点
+    #节点发电机出力，PV和Slack节点由Model.applyPower在潮流计算后求出
     def calSg(self):
-        if self.type == NodeType.PQ:
-            return 0 + 0 * 1j
-
-        Flow = 0 + 0 * 1j
-        for branch in self.connectedBranches:
-            if branch.node1 == self:
-                Flow += branch.Flow
-            else:
-                Flow -= branch.Flow
-
-        self.Pg = self.Pd + self.P + Flow.real
-        # if self.type == NodeType.Slack:
-        #     return self.P + self.Q * 1j
-        self.Qg = self.Qd + self.Q + Flow.imag
         return self.Pg + self.Qg * 1j
 
     #重写字符串输出
     def __str__(self) -> str:
         return f'\tNode {self.name}:\n\t\tType: {self.type}\n\t\tP: {self.P} r[{self.Pmin}~{self.Pmax}]\n\t\tQ: {self.Q} r[{self.Qmin}~{self.Qmax}]\n\t\tV: {np.abs(self.V)} ({self.V}) r[{self.Vmin}~{self.Vmax}]\n\t\ttheta: {self.getTheta()}({self.getTheta()/np.pi*180}d)'
 
-#导纳支路模型
+#导纳支路模型，支路数据保存在模型的支路表(NetworkState.branches)中
 class Branch:
-    def __init__(self, name, node1: Node, node2: Node, Y=0+0j):
+    __slots__ = ('name', 'node1', 'node2', 'table', 'index')
+
+    Y = Column('Y') #支路导纳
+    #支路电流，支路功率流，支路功率损耗
+    I = Column('I')
+    Flow = Column('Flow')
+    Loss = Column('Loss')
+    Irated = Column('Irated') #支路额定电流
+    #支路两端的对地导纳（线路充电电纳、变压器π型等值的对地支路），随支路一起投退
+    Ys1 = Column('Ys1')
+    Ys2 = Column('Ys2')
+    inService = Column('inService') #支路是否投入运行
+
+    def __init__(self, name, node1: Node, node2: Node, Y=0+0j, table=None):
         self.name = name
+        row = {
+            'Y': Y,
+            'I': 0+0j, 'Flow': 0+0j, 'Loss': 0+0j,
+            'Irated': 99999./Sb,
+            'Ys1': 0+0j, 'Ys2': 0+0j,
+            'inService': True,
+        }
+        if table is not None:
+            self.table, self.index = table, table.append(row)
+        else:
+            self.table, self.index = Row(BRANCH_COLUMNS, row), 0
 
         #支路两端的节点
         self.node1 = node1
@@ -97,32 +147,54 @@ class Branch:
         self.node1.connect(self)
         self.node2.connect(self)
 
-        #支路导纳
-        self.Y = Y
+    def __getstate__(self):
+        return self.name, self.node1, self.node2, self.table, self.index
 
-        #支路电流，支路功率流，支路功率损耗
-        self.I = 0+0j
-        self.Flow = 0+0j
-        self.Loss = 0+0j
-
-        #支路额定电流
-        self.Irated = 99999./Sb
+    def __setstate__(self, state):
+        self.name, self.node1, self.node2, self.table, self.index = state
+        self.node1.connect(self)
+        self.node2.connect(self)
 
     def __str__(self) -> str:
         return f'\tBranch {self.name}:\n\t\tNode1: {self.node1.name}\n\t\tNode2: {self.node2.name}\n\t\tY: {self.Y}'
 
+#节点导纳矩阵的一次局部修改：支路f-t的串联导纳由y0变为y1，两端对地导纳分别增加ys1、ys2
+#t为None时表示只修改节点f的对地导纳
+class YUpdate:
+    def __init__(self, f, t=None, y0=0j, y1=0j, ys1=0j, ys2=0j):
+        self.f = f
+        self.t = t
+        self.y0 = y0
+        self.y1 = y1
+        self.ys1 = ys1
+        self.ys2 = ys2
+
+    #返回修改涉及的节点序号idx和小矩阵D，使 ΔY = E[:, idx] D E[:, idx]^T
+    #series为作用在串联导纳上的函数(如快速解耦法中忽略电阻)，shunt为False时不计对地导纳
+    def block(self, series=None, shunt=True):
+        if self.t is None:
+            return np.array([self.f]), np.array([[self.ys1 if shunt else 0j]])
+        d = (series(self.y1) - series(self.y0)) if series else (self.y1 - self.y0)
+        D = np.array([[d, -d], [-d, d]], dtype=complex)
+        if shunt:
+            D[0, 0] += self.ys1
+            D[1, 1] += self.ys2
+        return np.array([self.f, self.t]), D
+
 #输入解析类，用于解析输入文件，解析每一行数据存入一个数组
 class Profile:
     def __init__(self, path):
         self.path = path
 
         #数据存在data数组中，一行一个数组元素，每一行也是数组，数组里面的元素是字符串
-        self.data = open(path, 'r').readlines()
-        self.data = [' '.join(line.strip().split()).split(' ')
-                     for line in self.data]
-        # drop lines start with '*'
-        self.data = [line for line in self.data if not (
-            len(line[0]) == 0 or line[0][0] == '*')]
+        with telemetry.phase('parse', path=path):
+            with open(path, 'r') as f:
+                self.data = f.readlines()
+            self.data = [' '.join(line.strip().split()).split(' ')
+                         for line in self.data]
+            # drop lines start with '*'
+            self.data = [line for line in self.data if not (
+                len(line[0]) == 0 or line[0][0] == '*')]
 
     def __str__(self) -> str:
         result = ''
@@ -139,72 +211,387 @@ class Model:
         self.nodes = []
         self.branches = []
 
+        #节点和支路数据的列存储，nodes[i]对应节点表的第i行，branches[k]对应支路表的第k行
+        self.state = NetworkState()
+
+        #名称到节点、支路对象及其序号的索引
+        self.nodeDict = {}
+        self.branchDict = {}
+        self.nodeIndex = {}
+        self.branchIndex = {}
+
+        #节点导纳矩阵及其修改的监听者(求解器)
+        self.Y = None
+        self.incidence = None
+        self.listeners = weakref.WeakSet()
+
+        #节点编号方式：None只按类型排序；'rcm'、'degree'在每类节点内部再按反向Cuthill-McKee或节点度数(静态排序)排列，
+        #设置后按节点编号的矩阵(直流潮流和快速解耦法的B'、B'')直接按此顺序分解，不再由COLAMD重新排序
+        #permutation[i]为当前第i个节点在添加顺序中的序号，结果可按此映射回原始顺序
+        self.ordering = None
+        self.permutation = np.zeros(0, dtype=np.int64)
+
+        #电气岛：islands[i]为第i个节点所在电气岛的编号，由detectIslands按投入运行的支路计算
+        self.islands = np.zeros(0, dtype=np.int64)
+        self.islandCount = 0
+
+    #监听者不参与序列化
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['listeners']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__dict__.setdefault('ordering', None)
+        self.__dict__.setdefault('permutation', np.zeros(0, dtype=np.int64))
+        self.__dict__.setdefault('islands', np.zeros(0, dtype=np.int64))
+        self.__dict__.setdefault('islandCount', 0)
+        self.listeners = weakref.WeakSet()
+
     #生成模型
     def compose(self, profile: Profile):
         self.profile = profile
         self.componentManager = ComponentManager(self)
         #解析输入文件，分析元件，生成节点和支路
-        self.componentManager.parseProfile(self.profile)
+        with telemetry.phase('compose'):
+            self.componentManager.parseProfile(self.profile)
+            self.detectIslands()
+        telemetry.event('islands', count=self.islandCount)
 
-    #添加节点
+    #添加节点，不在模型节点表中的节点数据复制到节点表
     def addNodes(self, *anodes):
+        buses = self.state.buses
         for node in anodes:
+            if node.table is not buses:
+                node.index = buses.append(node.table.row(node.index))
+                node.table = buses
+            self.nodeIndex[node.name] = len(self.nodes)
+            self.nodeDict[node.name] = node
             self.nodes.append(node)
 
-    #添加支路
+    #添加支路，名称重复时忽略
     def addBranches(self, *abranches):
+        branches = self.state.branches
         for branch in abranches:
-            for mbranch in self.branches:
-                if branch.name == mbranch.name:
-                    return None
+            if branch.name in self.branchDict:
+                return None
+            for node in (branch.node1, branch.node2):
+                if node.table is not self.state.buses:
+                    self.addNodes(node)
+            if branch.table is not branches:
+                branch.index = branches.append(branch.table.row(branch.index))
+                branch.table = branches
+            self.incidence = None
+            branches.data['f'][branch.index] = branch.node1.index
+            branches.data['t'][branch.index] = branch.node2.index
+            self.branchIndex[branch.name] = len(self.branches)
+            self.branchDict[branch.name] = branch
             self.branches.append(branch)
 
     #寻找节点，如果没有则创建
     def findNodeByName(self, name) -> Node:
-        for node in self.nodes:
-            if node.name == name:
-                return node
-        node = Node(name, NodeType.PQ)
-        self.nodes.append(node)
+        node = self.nodeDict.get(name)
+        if node is None:
+            node = Node(name, NodeType.PQ, table=self.state.buses)
+            self.addNodes(node)
         return node
 
     #寻找支路
     def findBranchByName(self, name) -> Branch:
-        for branch in self.branches:
-            if branch.name == name:
-                return branch
-        return None
+        return self.branchDict.get(name)
+
+    #计算节点导纳矩阵，sparse为True时返回CSR格式的稀疏矩阵
+    def deriveYMatrix(self, sparse=False):
+        with telemetry.phase('ybus', sparse=sparse):
+            buses, branches = self.state.buses, self.state.branches
+            n = len(self.nodes)
+
+            #节点按类型排序(PQ、PV、平衡节点)，节点表随之重排，并重建节点名称到序号的索引
+            order = self.busOrder()
+            if np.any(order != np.arange(n)):
+                self.incidence = None
+                self.state.permuteBuses(order)
+                self.nodes[:] = [self.nodes[i] for i in order]
+                for i, node in enumerate(self.nodes):
+                    node.index = i
+                self.permutation = self.permutation[order]
+            self.nodeIndex = {node.name: i for i, node in enumerate(self.nodes)}
+
+            #支路两端节点序号数组和支路导纳数组，保存在模型中供求解器使用
+            #退出运行的支路导纳和两端对地导纳按零计入
+            f, t = branches.f.copy(), branches.t.copy()
+            on = branches.inService
+            y = branches.Y * on
+            ys1 = branches.Ys1 * on
+            ys2 = branches.Ys2 * on
+            ys = buses.Ys + np.bincount(f, ys1.real, n) + np.bincount(t, ys2.real, n) + 1j * (np.bincount(f, ys1.imag, n) + np.bincount(t, ys2.imag, n))
+            self.branchFrom, self.branchTo, self.branchY, self.nodeYs = f, t, y, ys
+
+            Y = self.assembleYMatrix(n, f, t, y, ys, sparse)
+            self.Y = Y
+
+            return Y
+
+    #节点的新顺序，order[i]为排序后第i个节点的当前序号，各类节点保持PQ、PV、平衡节点的先后次序
+    def busOrder(self):
+        buses, branches = self.state.buses, self.state.branches
+        n = len(self.nodes)
+        if len(self.permutation) < n:
+            self.permutation = np.concatenate([self.permutation, np.arange(len(self.permutation), n)])
+        if self.ordering is None:
+            return np.argsort(buses.type, kind='stable')
+        if self.ordering not in ('rcm', 'degree'):
+            raise ValueError(f'Unknown bus ordering: {self.ordering}')
+
+        #在添加顺序下计算排序，重复调用时结果不变，节点不会被反复重排
+        #结构按全部支路计算(包括退出运行的支路)，支路投切不改变节点顺序
+        perm = self.permutation
+        inverse = np.argsort(perm)
+        types = buses.type[inverse]
+        f, t = perm[branches.f], perm[branches.t]
+        target = []
+        for value in np.unique(types):
+            block = np.flatnonzero(types == value)
+            local = np.full(n, -1, dtype=np.int64)
+            local[block] = np.arange(len(block))
+            inner = (local[f] >= 0) & (local[t] >= 0) & (f != t)
+            if self.ordering == 'rcm':
+                A = sp.coo_matrix((np.ones(inner.sum()), (local[f[inner]], local[t[inner]])), shape=(len(block), len(block))).tocsr()
+                target.append(block[reverse_cuthill_mckee(A + A.T, symmetric_mode=True)])
+            else:
+                #静态度数排序：按节点在整个网络中的度数从小到大，排序时不考虑消元过程中度数的变化
+                degree = np.bincount(f, minlength=n) + np.bincount(t, minlength=n)
+                target.append(block[np.argsort(degree[block], kind='stable')])
+        return inverse[np.concatenate(target)]
 
-    #计算节点导纳矩阵
-    def deriveYMatrix(self):
-        self.nodes.sort(key=lambda node: node.type.value)
+    #按输入文件(添加)顺序排列节点时的当前节点序号，order[k]为第k个添加的节点当前的序号，未重排时为恒等排列
+    def inputOrder(self):
         n = len(self.nodes)
+        return np.argsort(self.permutation) if len(self.permutation) == n else np.arange(n)
+
+    #按节点编号的矩阵进行稀疏LU分解时的列排序方式，已设置节点编号方式时保持该顺序
+    #雅可比矩阵按[有功, 无功]分块，节点顺序不能直接作为分解顺序，仍使用COLAMD
+    def factorOrdering(self):
+        return 'COLAMD' if self.ordering is None else 'NATURAL'
+
+    #一次性组装节点导纳矩阵，f、t为支路两端节点序号，y为支路导纳，ys为节点自导纳
+    @staticmethod
+    def assembleYMatrix(n, f, t, y, ys, sparse=False):
+        #每条支路贡献四个元素，节点自导纳贡献对角元素
+        rows = np.concatenate([f, t, f, t, np.arange(n)])
+        cols = np.concatenate([t, f, f, t, np.arange(n)])
+        vals = np.concatenate([-y, -y, y, y, ys])
+
+        if sparse:
+            #重复元素在转换为CSR时自动相加
+            return sp.coo_matrix((vals, (rows, cols)), shape=(n, n)).tocsr()
+
         Y = np.zeros((n, n), dtype=complex)
+        np.add.at(Y, (rows, cols), vals)
+        return Y
 
-        #遍历模型中的支路，逐渐添加支路到空的导纳矩阵中
-        for branch in self.branches:
-            i = self.nodes.index(branch.node1)
-            j = self.nodes.index(branch.node2)
-            Y[i, j] = -branch.Y
-            Y[j, i] = -branch.Y
-            Y[i, i] += branch.Y
-            Y[j, j] += branch.Y
-
-        #考虑节点自导纳对节点导纳矩阵的影响
-        for node in self.nodes:
-            i = self.nodes.index(node)
-            Y[i, i] += node.Ys
-        
-        #打印节点导纳矩阵
+    #将局部修改idx、D叠加到节点导纳矩阵Y上，稀疏矩阵中已有的元素原地修改
+    @staticmethod
+    def stampYMatrix(Y, idx, D):
+        for a, i in enumerate(idx):
+            for b, j in enumerate(idx):
+                if D[a, b] != 0:
+                    Y[i, j] += D[a, b]
+        return Y
+
+    #应用一次局部修改，更新模型中的导纳数据并通知求解器
+    def updateYMatrix(self, update: YUpdate):
+        if self.Y is None:
+            return
+        idx, D = update.block()
+        #新增非零元素时结构发生变化，求解器需重建雅可比矩阵结构
+        if sp.issparse(self.Y):
+            nnz = self.Y.nnz
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', sp.SparseEfficiencyWarning)
+                self.stampYMatrix(self.Y, idx, D)
+            structural = self.Y.nnz != nnz
+        else:
+            structural = bool(np.any((D != 0) & (self.Y[np.ix_(idx, idx)] == 0)))
+            self.stampYMatrix(self.Y, idx, D)
+        self.nodeYs[update.f] += update.ys1
+        if update.t is not None:
+            self.nodeYs[update.t] += update.ys2
+        for listener in list(self.listeners):
+            listener.onYUpdate(update, structural)
+
+    #支路当前计入导纳矩阵的串联导纳和两端对地导纳
+    @staticmethod
+    def branchAdmittance(branch):
+        if not branch.inService:
+            return 0j, 0j, 0j
+        return branch.Y, branch.Ys1, branch.Ys2
+
+    #修改支路参数或投退状态，只更新导纳矩阵中的四个元素
+    def modifyBranch(self, name, Y=None, Ys1=None, Ys2=None, inService=None):
+        branch = self.findBranchByName(name)
+        y0, ys10, ys20 = self.branchAdmittance(branch)
+        if Y is not None:
+            branch.Y = Y
+        if Ys1 is not None:
+            branch.Ys1 = Ys1
+        if Ys2 is not None:
+            branch.Ys2 = Ys2
+        if inService is not None:
+            branch.inService = inService
+        y1, ys11, ys21 = self.branchAdmittance(branch)
+
+        if self.Y is None:
+            return branch
+        k = self.branchIndex[name]
+        self.branchY[k] = y1
+        self.updateYMatrix(YUpdate(self.branchFrom[k], self.branchTo[k], y0, y1, ys11 - ys10, ys21 - ys20))
+        return branch
+
+    #投退支路
+    def switchBranch(self, name, inService):
+        return self.modifyBranch(name, inService=inService)
+
+    #添加一条连接已有节点的支路，支路名称已存在时抛出ValueError，模型不做任何修改
+    def addBranch(self, branch: Branch):
+        if branch.name in self.branchDict:
+            raise ValueError(f'Duplicate branch name: {branch.name}')
+        self.addBranches(branch)
+        if self.Y is None:
+            return branch
+        f, t = self.nodeIndex[branch.node1.name], self.nodeIndex[branch.node2.name]
+        y, ys1, ys2 = self.branchAdmittance(branch)
+        self.branchFrom = np.append(self.branchFrom, f)
+        self.branchTo = np.append(self.branchTo, t)
+        self.branchY = np.append(self.branchY, y)
+        self.updateYMatrix(YUpdate(f, t, 0j, y, ys1, ys2))
+        return branch
+
+    #删除支路
+    def removeBranch(self, name):
+        branch = self.findBranchByName(name)
+        k = self.branchIndex.pop(name)
+        del self.branchDict[name]
+        y, ys1, ys2 = self.branchAdmittance(branch)
+        #删除的支路保留自己的一行数据，其后的支路在支路表中前移
+        branch.table, branch.index = Row(BRANCH_COLUMNS, self.state.branches.row(k)), 0
+        self.state.branches.delete(k)
+        self.incidence = None
+        self.branches.pop(k)
+        for i in range(k, len(self.branches)):
+            self.branches[i].index = i
+            self.branchIndex[self.branches[i].name] = i
+        branch.node1.connectedBranches.remove(branch)
+        branch.node2.connectedBranches.remove(branch)
+        if self.Y is None:
+            return branch
+        f, t = self.branchFrom[k], self.branchTo[k]
+        self.branchFrom = np.delete(self.branchFrom, k)
+        self.branchTo = np.delete(self.branchTo, k)
+        self.branchY = np.delete(self.branchY, k)
+        self.updateYMatrix(YUpdate(f, t, y, 0j, -ys1, -ys2))
+        return branch
+
+    #按投入运行的支路求电气岛(连通分量)，返回每个节点所在电气岛的编号
+    def detectIslands(self):
+        branches = self.state.branches
+        n = len(self.nodes)
+        on = branches.inService
+        A = sp.coo_matrix((np.ones(on.sum()), (branches.f[on], branches.t[on])), shape=(n, n))
+        self.islandCount, self.islands = connected_components(A, directed=False)
+        return self.islands
+
+    #支路-节点关联矩阵(m×n)，第k行在支路首端节点处为1，末端节点处为-1
+    def incidenceMatrix(self):
+        if self.incidence is None:
+            branches = self.state.branches
+            m, n = len(branches), len(self.nodes)
+            rows = np.repeat(np.arange(m), 2)
+            cols = np.column_stack([branches.f, branches.t]).ravel()
+            self.incidence = sp.csr_matrix((np.tile([1., -1.], m), (rows, cols)), shape=(m, n))
+        return self.incidence
+
+    #一次计算所有支路的电流、功率和损耗及网络总损耗，结果写入支路表
+    def calBranchesFlow(self):
+        buses, branches = self.state.buses, self.state.branches
+        V = buses.V
+        y = branches.Y * branches.inService
+        I = y * (self.incidenceMatrix() @ V)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            loss = np.where(y != 0, np.abs(I)**2 / np.conj(branches.Y), 0j)
+        branches.I = I
+        branches.Loss = loss
+        branches.Flow = V[branches.f] * np.conj(I)
+        self.loss = loss.sum()
+
+    #一次计算所有节点的注入功率 S = V∘conj(Y·V)，补全PV节点的无功、平衡节点的有功和无功，
+    #PV节点电压幅值恢复为给定值(无功越限的节点除外，limited见checkQLimits)，PV和平衡节点的发电机出力为注入功率与负荷之和
+    def applyPower(self, Y=None, limited=None):
+        Y = self.Y if Y is None else Y
+        buses = self.state.buses
+        V = buses.V
+        S = V * np.conj(Y @ V)
+        pv = buses.type == NodeType.PV.value
+        slack = buses.type == NodeType.Slack.value
+        gen = pv | slack
+        buses.Q[gen] = S[gen].imag
+        buses.P[slack] = S[slack].real
+        if limited is not None:
+            pv &= limited == 0
+        buses.V[pv] = buses.oV[pv] * np.exp(1j * np.angle(V[pv]))
+        buses.Pg[gen] = buses.P[gen] + buses.Pd[gen]
+        buses.Qg[gen] = buses.Q[gen] + buses.Qd[gen]
+        return S
+
+    #检查PV节点的无功出力是否越限，S为节点注入功率，V为节点电压
+    #limited为各节点的越限状态(1为达到上限，-1为达到下限，0为未越限)，原地修改：越限的PV节点按PQ节点处理，
+    #达到上限而电压高于给定值、或达到下限而电压低于给定值的节点恢复为PV节点；平衡节点和不可改变类型的节点不检查
+    #每轮只向一个方向切换：有节点越限时只处理越限，没有越限时才恢复PV节点，避免相互影响的节点同时切换、来回振荡
+    #返回是否有节点的状态改变
+    def checkQLimits(self, S, V, limited, tol=1e-6):
+        buses = self.state.buses
+        Qg = S.imag + buses.Qd
+        free = (buses.type == NodeType.PV.value) & buses.canChangeType & (limited == 0)
+        over = free & (Qg > buses.Qmax + tol)
+        under = free & (Qg < buses.Qmin - tol)
+        if over.any() or under.any():
+            limited[over] = 1
+            limited[under] = -1
+            return True
+        Vm, Vset = np.abs(V), np.abs(buses.oV)
+        back = ((limited == 1) & (Vm > Vset + tol)) | ((limited == -1) & (Vm < Vset - tol))
+        limited[back] = 0
+        return bool(back.any())
+
+    #越限节点的无功注入功率给定值(无功限值减去负荷无功)
+    def limitQ(self, limited):
+        buses = self.state.buses
+        return np.where(limited > 0, buses.Qmax, buses.Qmin) - buses.Qd
+
+    #修改节点并联导纳
+    def modifyShunt(self, name, Ys):
+        node = self.findNodeByName(name)
+        dys = Ys - node.Ys
+        node.Ys = Ys
+        if self.Y is not None:
+            self.updateYMatrix(YUpdate(self.nodeIndex[name], ys1=dys))
+        return node
+
+    #打印节点导纳矩阵
+    def printYMatrix(self):
+        Y = self.Y
+        n = len(self.nodes)
         print('Y Matrix(.0f):')
+        if sp.issparse(Y):
+            print(Y)
+            return
         for i in range(n):
             print(f'{self.nodes[i].name}', end='\t')
             for j in range(n):
                 print(f'{Y[i,j]:f}', end='\t')
             print()
 
-        return Y
-
     def printTopology(self):
         print('Nodes:')
         for node in self.nodes:
@@ -217,6 +604,7 @@ class Model:
 class ComponentManager:
     def __init__(self, model: Model = None):
         self.components = []
+        self.componentDict = {} #元件名称到元件的索引，名称重复时保留第一个
         self.model = model
 
     #解析输入的数据，对行进行遍历
@@ -286,7 +674,6 @@ class ComponentManager:
                 pass
             #解析平衡节点数据，并应用于模型
             case 'THSLACK':
-                print("Dealing with THSlack")
                 gener: GENER = self.findComponentByName(strList[1])
                 node: Node = self.model.findNodeByName(gener.node1)
                 node.V = float(strList[2])
@@ -295,7 +682,6 @@ class ComponentManager:
                 node.canChangeType = False
                 pass
             case 'SLACKPH':
-                print("Dealing with SlackPH")
                 gener: GENER = self.findComponentByName(strList[1])
                 node: Node = self.model.findNodeByName(gener.node1)
                 node.V = float(strList[4])
@@ -311,14 +697,12 @@ class ComponentManager:
     #添加元件到管理类
     def addComponent(self, component) -> Component:
         self.components.append(component)
+        self.componentDict.setdefault(component.name, component)
         return component
 
     #根据元件名查找元件
     def findComponentByName(self, name):
-        for component in self.components:
-            if component.name == name:
-                return component
-        return None
+        return self.componentDict.get(name)
 
 #线路模型
 class THLINE(Component):
@@ -332,8 +716,6 @@ class THLINE(Component):
         self.X = float(strList[5])
         self.nBf2 = float(strList[6])
 
-        print(f'Parsing {self.name}...')
-
     #在所给的模型中创建线路对应的导纳模型
     def apply(self, model: Model):
         node1: Node = model.findNodeByName(self.node1)
@@ -341,8 +723,8 @@ class THLINE(Component):
         branchLine = Branch(
             self.name, node1, node2, Y=1/(self.R + self.X*1j))
         branchLine
-        node1.Ys += -self.nBf2 * 1j
-        node2.Ys += -self.nBf2 * 1j
+        branchLine.Ys1 = -self.nBf2 * 1j
+        branchLine.Ys2 = -self.nBf2 * 1j
         model.addBranches(branchLine)
 
 #同上，支持修改工作状态
@@ -357,7 +739,6 @@ class LINE(Component):
         self.nBf2 = float(strList[6])
         self.Irated = float(strList[7])/Sb
         self.state = (int(strList[8])+int(strList[9]))
-        print(f'Parsing {self.name}...')
 
     def apply(self, model: Model):
         if self.state == 0 or self.state == 1:
@@ -367,8 +748,8 @@ class LINE(Component):
         branchLine = Branch(
             self.name, node1, node2, Y=1/(self.R + self.X*1j))
         branchLine.Irated = self.Irated
-        node1.Ys += -self.nBf2 * 1j
-        node2.Ys += -self.nBf2 * 1j
+        branchLine.Ys1 = -self.nBf2 * 1j
+        branchLine.Ys2 = -self.nBf2 * 1j
         model.addBranches(branchLine)
 
 #变压器模型
@@ -382,7 +763,6 @@ class THTRFO(Component):
         self.R = float(strList[4])
         self.X = float(strList[5])
         self.k = float(strList[6])/100
-        print(f'Parsing {self.name}...')
 
     #在所给的模型中创建变压器对应的导纳模型
     def apply(self, model: Model):
@@ -391,9 +771,9 @@ class THTRFO(Component):
         #支路导纳
         branchT = Branch(
             self.name, node1, node2, Y=1 / (self.R + self.X*1j) / self.k)
-        #节点导纳
-        node1.Ys += (self.k - 1) / (self.R + self.X*1j) / self.k
-        node2.Ys += (1 - self.k) / (self.R + self.X*1j) / self.k**2
+        #支路两端的对地导纳
+        branchT.Ys1 = (self.k - 1) / (self.R + self.X*1j) / self.k
+        branchT.Ys2 = (1 - self.k) / (self.R + self.X*1j) / self.k**2
         #在模型中添加支路
         model.addBranches(branchT)
 
@@ -409,7 +789,6 @@ class TRFO(Component):
         self.k = float(strList[6])/100
         self.Irated = float(strList[7])/Sb
         self.state = (int(strList[8])+int(strList[9]))
-        print(f'Parsing {self.name}...')
 
     def apply(self, model: Model):
         if self.state == 0 or self.state == 1:
@@ -419,8 +798,8 @@ class TRFO(Component):
         branchT = Branch(
             self.name, node1, node2, Y=1 / (self.R + self.X*1j) / self.k)
         branchT.Irated = self.Irated
-        node1.Ys += (self.k - 1) / (self.R + self.X*1j) / self.k
-        node2.Ys += (1 - self.k) / (self.R + self.X*1j) / self.k**2
+        branchT.Ys1 = (self.k - 1) / (self.R + self.X*1j) / self.k
+        branchT.Ys2 = (1 - self.k) / (self.R + self.X*1j) / self.k**2
         model.addBranches(branchT)
 
 #并联功率元件模型
@@ -432,7 +811,6 @@ class THSHUNT(Component):
         self.node1 = strList[2]
         self.G = float(strList[3])
         self.B = float(strList[4])
-        print(f'Parsing {self.name}...')
 
     #在所给的模型中创建并联元件对应的导纳模型
     def apply(self, model: Model):
@@ -448,7 +826,6 @@ class THLOAD(Component):
         self.node1 = strList[2]
         self.P = float(strList[3])
         self.Q = float(strList[4])
-        print(f'Parsing {self.name}...')
 
     #将符合添加到节点上
     def apply(self, model: Model):
@@ -469,7 +846,6 @@ class LOAD2(Component):
         self.P = float(strList[3])/Sb
         self.Q = float(strList[4])/Sb
         self.state = int(strList[10])
-        print(f'Parsing {self.name}...')
 
     def apply(self, model: Model):
         if self.state == 0:
@@ -491,7 +867,6 @@ class GENERCV(Component):
         self.V = float(strList[5])
         self.oV = self.V
         self.state = int(strList[6])
-        print(f'Parsing {self.name}...')
 
     def apply(self, model: Model):
         if self.state == 0:
@@ -512,7 +887,6 @@ class GENER(Component):
         self.P = float(strList[3])/Sb
         self.Q = float(strList[4])/Sb
         self.state = int(strList[5])
-        print(f'Parsing {self.name}...')
 
     def apply(self, model: Model):
         if self.state == 0:
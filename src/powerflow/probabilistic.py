@@ -0,0 +1,287 @@
+import warnings
+import numpy as np
+import scipy.sparse as sp
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from powerflow.model import Model
+from powerflow.Newton_Polar import NewtonPolar
+from powerflow.Newton_Batch import NewtonBatch
+from powerflow.telemetry import telemetry
+
+#蒙特卡洛概率潮流：随机抽取负荷和新能源出力，大量样本分批在进程池中求解，
+#节点导纳矩阵、关联矩阵和基态数据只在主进程中形成一次，放入共享内存，工作进程直接映射使用而不复制；
+#每批样本以基态潮流结果为初值用批量牛顿法求解，工作进程只返回该批的统计量(矩和直方图)，
+#主进程逐批合并，得到节点电压和支路负载率的均值、标准差、极值和分位数，不保存逐个样本的结果
+
+#多个数组放在同一块共享内存中，layout为(共享内存名称, {数组名: (偏移, dtype, shape)})，可传给工作进程
+class SharedArrays:
+    def __init__(self, arrays):
+        fields = {}
+        offset = 0
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            offset = (offset + 63) // 64 * 64
+            fields[name] = (offset, array.dtype.str, array.shape)
+            offset += array.nbytes
+        self.shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        self.layout = (self.shm.name, fields)
+        self.arrays = self.views(self.shm, fields)
+        for name, array in arrays.items():
+            self.arrays[name][...] = array
+
+    #共享内存中各数组的视图
+    @staticmethod
+    def views(shm, fields):
+        return {name: np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset) for name, (offset, dtype, shape) in fields.items()}
+
+    #在工作进程中按layout映射共享内存，返回(共享内存对象, 数组视图)；共享内存由创建它的主进程释放
+    @staticmethod
+    def attach(layout):
+        name, fields = layout
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            #Python 3.13以前没有track参数，工作进程与主进程共用资源跟踪进程，重复登记没有影响
+            shm = shared_memory.SharedMemory(name=name)
+        return shm, SharedArrays.views(shm, fields)
+
+    def close(self):
+        self.arrays = None
+        self.shm.close()
+        self.shm.unlink()
+
+#按列的流式统计：样本数、均值、离差平方和、极值和固定分箱的直方图，两组统计量可以合并，
+#分位数由直方图插值得到，精度为分箱宽度；低于第一个边界和高于最后一个边界的样本分别以最小值、最大值为边界
+class RunningStatistics:
+    def __init__(self, size, bins):
+        self.bins = np.asarray(bins, dtype=float)
+        self.count = 0
+        self.mean = np.zeros(size)
+        self.M2 = np.zeros(size)
+        self.min = np.full(size, np.inf)
+        self.max = np.full(size, -np.inf)
+        self.histogram = np.zeros((size, len(self.bins) + 1), dtype=np.int64)
+
+    #加入一批样本，values为(样本数×列数)
+    def update(self, values):
+        values = np.atleast_2d(values)
+        if len(values) == 0:
+            return self
+        size, width = values.shape[1], len(self.bins) + 1
+        batch = RunningStatistics(size, self.bins)
+        batch.count = len(values)
+        batch.mean = values.mean(axis=0)
+        batch.M2 = ((values - batch.mean) ** 2).sum(axis=0)
+        batch.min = values.min(axis=0)
+        batch.max = values.max(axis=0)
+        index = np.searchsorted(self.bins, values, side='right') + np.arange(size) * width
+        batch.histogram = np.bincount(index.ravel(), minlength=size * width).reshape(size, width)
+        return self.merge(batch)
+
+    #合并另一组统计量(分箱须相同)
+    def merge(self, other):
+        if other.count == 0:
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * (other.count / count)
+        self.M2 = self.M2 + other.M2 + delta ** 2 * (self.count * other.count / count)
+        self.count = count
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+        self.histogram += other.histogram
+        return self
+
+    @property
+    def std(self):
+        return np.sqrt(self.M2 / max(self.count - 1, 1))
+
+    #q分位数，q为数或数组，返回(len(q)×列数)或(列数,)
+    def quantile(self, q):
+        q = np.asarray(q, dtype=float)
+        size = len(self.mean)
+        cumulative = np.cumsum(self.histogram, axis=1)
+        #各分箱的上下边界，两端的分箱以极值为边界
+        lower = np.column_stack([self.min, np.broadcast_to(self.bins, (size, len(self.bins)))])
+        upper = np.column_stack([np.broadcast_to(self.bins, (size, len(self.bins))), self.max])
+        rows = np.arange(size)
+        result = []
+        for target in np.atleast_1d(q) * self.count:
+            k = np.argmax(cumulative >= target, axis=1)
+            before = np.where(k > 0, cumulative[rows, k - 1], 0)
+            inside = np.maximum(self.histogram[rows, k], 1)
+            lo = np.maximum(lower[rows, k], self.min)
+            hi = np.minimum(upper[rows, k], self.max)
+            result.append(lo + (hi - lo) * np.clip((target - before) / inside, 0, 1))
+        result = np.array(result)
+        return result[0] if q.ndim == 0 else result
+
+#概率潮流，model为已组建的模型；processes为进程数(1表示在当前进程中计算)，batchSize为每批的样本数
+class ProbabilisticLoadFlow:
+    def __init__(self, model: Model, sparse=True, processes=None, batchSize=1000, seed=None):
+        self.model = model
+        self.sparse = sparse
+        self.processes = processes
+        self.batchSize = batchSize
+        self.seed = seed
+        self.maxIterations = 20 #每个样本的最大迭代次数，超过的样本记为不收敛
+        #负荷按恒功率因数随机波动，倍率服从均值为1、标准差为loadSigma的正态分布(不小于零)
+        self.loadSigma = 0.1
+        #新能源：{节点名: 装机容量(标幺值)}，出力为装机容量乘以服从Beta(alpha, beta)分布的可用率，叠加在节点原有注入功率上
+        self.renewables = {}
+        self.alpha = 2.
+        self.beta = 2.
+        #统计直方图的分箱边界：节点电压幅值(标幺值)和支路负载率(|I|/Irated)
+        self.voltageBins = np.linspace(0.85, 1.15, 301)
+        self.loadingBins = np.linspace(0., 1.5, 301)
+
+        #基态潮流，作为各样本的初值
+        base = NewtonPolar(model, sparse=sparse)
+        base.solve()
+        if not base.converged:
+            raise RuntimeError('Base case power flow did not converge')
+        self.Y = sp.csr_matrix(base.Y)
+
+        #结果中节点按输入文件的顺序排列，只统计给定了额定电流的支路
+        branches = model.state.branches
+        self.order = model.inputOrder()
+        self.nodeNames = [model.nodes[i].name for i in self.order.tolist()]
+        self.rated = np.flatnonzero(branches.Irated > 0)
+        self.branchNames = [model.branches[k].name for k in self.rated.tolist()]
+
+    #放入共享内存的数组：导纳矩阵和关联矩阵(额定支路)的CSR数组、支路导纳、基态节点数据
+    def sharedArrays(self):
+        model = self.model
+        buses, branches = model.state.buses, model.state.branches
+        A = sp.csr_matrix(model.incidenceMatrix()[self.rated])
+        renewables = np.array([model.nodeIndex[name] for name in self.renewables], dtype=np.int64)
+        return {
+            'Ydata': self.Y.data, 'Yindices': self.Y.indices, 'Yindptr': self.Y.indptr,
+            'Adata': A.data, 'Aindices': A.indices, 'Aindptr': A.indptr,
+            'y': (branches.Y * branches.inService)[self.rated], 'Irated': branches.Irated[self.rated],
+            'type': buses.type, 'V': buses.V, 'Pd': buses.Pd, 'Qd': buses.Qd,
+            'Pg': buses.P + buses.Pd, 'Qg': buses.Q + buses.Qd,
+            'order': self.order,
+            'renewables': renewables, 'capacity': np.array(list(self.renewables.values()), dtype=float),
+        }
+
+    #工作进程所需的参数
+    def settings(self):
+        return {
+            'sparse': self.sparse, 'maxIterations': self.maxIterations,
+            'loadSigma': self.loadSigma, 'alpha': self.alpha, 'beta': self.beta,
+            'voltageBins': self.voltageBins, 'loadingBins': self.loadingBins,
+        }
+
+    #分批求解samples个样本，每完成一批产生一次合并后的(节点电压统计, 支路负载率统计, 不收敛样本数)
+    #各批的随机数种子由seed派生，结果与进程数无关；fallbacks为因雅可比矩阵奇异而逐个样本重新求解的批数
+    def iterate(self, samples):
+        sizes = [min(self.batchSize, samples - start) for start in range(0, samples, self.batchSize)]
+        seeds = np.random.SeedSequence(self.seed).spawn(len(sizes))
+        voltage = RunningStatistics(len(self.nodeNames), self.voltageBins)
+        loading = RunningStatistics(len(self.branchNames), self.loadingBins)
+        failed = 0
+        self.fallbacks = 0
+
+        shared = pool = None
+        try:
+            if self.processes == 1:
+                _setupWorker(self.sharedArrays(), self.settings())
+                results = map(_solveBatch, seeds, sizes)
+            else:
+                shared = SharedArrays(self.sharedArrays())
+                pool = ProcessPoolExecutor(max_workers=self.processes, initializer=_initWorker,
+                                           initargs=(shared.layout, self.settings()))
+                results = pool.map(_solveBatch, seeds, sizes)
+            for batch, result in enumerate(results):
+                voltage.merge(result[0])
+                loading.merge(result[1])
+                failed += result[2]
+                if result[3]:
+                    self.fallbacks += 1
+                    telemetry.event('fallback', batch=batch)
+                    warnings.warn(f'Batch {batch} had a singular Jacobian and was re-solved sample by sample', RuntimeWarning)
+                telemetry.event('batch', batch=batch, samples=voltage.count + failed, failed=failed)
+                yield voltage, loading, failed
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+            if shared is not None:
+                shared.close()
+
+    #求解全部样本，统计结果保存在voltage、loading中
+    def run(self, samples=100000):
+        self.voltage = RunningStatistics(len(self.nodeNames), self.voltageBins)
+        self.loading = RunningStatistics(len(self.branchNames), self.loadingBins)
+        self.failed = 0
+        for self.voltage, self.loading, self.failed in self.iterate(samples):
+            pass
+        self.samples = samples
+        return self
+
+    #输出统计结果，top为按最大负载率列出的支路数
+    def listStatistics(self, quantiles=(0.05, 0.5, 0.95), top=10):
+        header = '\t'.join(f'q{round(q * 100)}' for q in quantiles)
+        print(f"Samples: {self.samples}\tFailed: {self.failed}\tFallback batches: {self.fallbacks}")
+        print(f"Node\tVmean\tVstd\tVmin\tVmax\t{header}")
+        Vq = self.voltage.quantile(quantiles)
+        for i, name in enumerate(self.nodeNames):
+            values = [self.voltage.mean[i], self.voltage.std[i], self.voltage.min[i], self.voltage.max[i]] + Vq[:, i].tolist()
+            print('\t'.join([name] + ['%.4f' % value for value in values]))
+        print()
+        print(f"Branch\tLmean\tLstd\tLmax\t{header}")
+        Lq = self.loading.quantile(quantiles)
+        for k in np.argsort(-self.loading.max)[:top].tolist():
+            values = [self.loading.mean[k], self.loading.std[k], self.loading.max[k]] + Lq[:, k].tolist()
+            print('\t'.join([self.branchNames[k]] + ['%.4f' % value for value in values]))
+        print()
+
+#工作进程中的共享数组和求解器，每个进程只建立一次
+_worker = {}
+
+def _initWorker(layout, settings):
+    _worker['shm'], arrays = SharedArrays.attach(layout)
+    _setupWorker(arrays, settings)
+
+def _setupWorker(arrays, settings):
+    n = len(arrays['type'])
+    Y = sp.csr_matrix((arrays['Ydata'], arrays['Yindices'], arrays['Yindptr']), shape=(n, n), copy=False)
+    A = sp.csr_matrix((arrays['Adata'], arrays['Aindices'], arrays['Aindptr']), shape=(len(arrays['y']), n), copy=False)
+    cal = NewtonBatch.fromArrays(Y, arrays['type'], arrays['Pg'] - arrays['Pd'], arrays['Qg'] - arrays['Qd'], arrays['V'], settings['sparse'])
+    cal.maxIterations = settings['maxIterations']
+    _worker.update(arrays=arrays, settings=settings, cal=cal, A=A)
+
+#抽样并求解一批样本，返回(节点电压统计, 支路负载率统计, 不收敛样本数, 是否逐个样本重新求解)
+def _solveBatch(seed, size):
+    arrays, settings, cal = _worker['arrays'], _worker['settings'], _worker['cal']
+    rng = np.random.default_rng(seed)
+    n = len(arrays['type'])
+    load = np.maximum(rng.normal(1., settings['loadSigma'], (size, n)), 0.)
+    P = arrays['Pg'] - arrays['Pd'] * load
+    Q = arrays['Qg'] - arrays['Qd'] * load
+    if len(arrays['renewables']):
+        P[:, arrays['renewables']] += arrays['capacity'] * rng.beta(settings['alpha'], settings['beta'], (size, len(arrays['renewables'])))
+
+    fallback = False
+    with np.errstate(all='ignore'):
+        try:
+            V = cal.solve(P, Q)
+            converged = cal.converged.copy()
+        except (np.linalg.LinAlgError, RuntimeError):
+            #批量求解中有雅可比矩阵奇异的样本时逐个求解，由主进程报告
+            fallback = True
+            V = np.empty((size, n), dtype=complex)
+            converged = np.zeros(size, dtype=bool)
+            for s in range(size):
+                try:
+                    V[s] = cal.solve(P[s], Q[s])[0]
+                    converged[s] = cal.converged[0]
+                except (np.linalg.LinAlgError, RuntimeError):
+                    pass
+        converged &= np.isfinite(V).all(axis=1)
+        V = V[converged]
+        loading = np.abs(arrays['y'] * (_worker['A'] @ V.T).T) / arrays['Irated']
+
+    voltage = RunningStatistics(n, settings['voltageBins']).update(np.abs(V)[:, arrays['order']])
+    loading = RunningStatistics(len(arrays['y']), settings['loadingBins']).update(loading)
+    return voltage, loading, int(size - converged.sum()), fallback
@@ -1,4 +1,6 @@
 import sys, os
+import zipfile
+import tempfile
 import numpy as np
 from powerflow.model import Model, NodeType
 from powerflow.utils import C2P, P2C, P2Complex
@@ -8,49 +10,230 @@ class Report:
     def __init__(self, model: Model) -> None:
         self.model = model
     
-    #输出模型节点信息
+    #输出模型节点信息，结果直接从节点表读取，不再重新计算
     def listNodes(self):
+        buses = self.model.state.buses
+        Vm, Va = np.abs(buses.V).tolist(), np.angle(buses.V).tolist()
+        columns = [buses.P.tolist(), buses.Q.tolist(), buses.Pd.tolist(), buses.Qd.tolist(), buses.Pg.tolist(), buses.Qg.tolist()]
+        limits = [getattr(buses, name).tolist() for name in ('Pmax', 'Pmin', 'Qmax', 'Qmin', 'Vmax', 'Vmin')]
         table=[]
         print(f"Nodes\ttype\t\tP\tQ\tV\t\ttheta\tSd\t\tSg\t\tPmax\tPmin\tQmax\tQmin\tVmax\tVmin")
         for i, node in enumerate(self.model.nodes):
+            P, Q, Pd, Qd, Pg, Qg = (column[i] for column in columns)
             table.append('\t'.join([str(value) for value in (
                 node.name,
                 str(node.type),
-                '%.2f'%node.P,
-                '%.2f'%node.Q,
-                '%.2f`%.2f'%(np.abs(node.V),np.angle(node.V)),
-                '%.2f'%node.getTheta(),
-                '%.2f+%.2fj'%(node.Pd,node.Qd),
-                '%.2f+%.2fj'%(node.calSg().real,node.calSg().imag),
-                node.Pmax,
-                node.Pmin,
-                node.Qmax,
-                node.Qmin,
-                node.Vmax,
-                node.Vmin
+                '%.2f'%P,
+                '%.2f'%Q,
+                '%.2f`%.2f'%(Vm[i],Va[i]),
+                '%.2f'%Va[i],
+                '%.2f+%.2fj'%(Pd,Qd),
+                '%.2f+%.2fj'%(Pg,Qg),
+                *(limit[i] for limit in limits)
             )]))
            
         print('\n'.join(table))
         print()
             
-    #输出模型支路信息
+    #输出模型支路信息，结果直接从支路表读取
     def listBranches(self):
+        branches = self.model.state.branches
+        polar = [(np.abs(x).tolist(), np.angle(x).tolist()) for x in (branches.Y, branches.Flow, branches.Loss, branches.I)]
+        Irated = branches.Irated.tolist()
         table=[]
         print(f"Branchesfrom\tto\tY\t\tFlow\t\tLoss\t\tI\t\tIrated")
         for i, branch in enumerate(self.model.branches):
+            (Y, aY), (Flow, aFlow), (Loss, aLoss), (I, aI) = ((x[0][i], x[1][i]) for x in polar)
             table.append('\t'.join([str(value) for value in (
                 branch.name,
                 branch.node1.name,
                 branch.node2.name,
-                '%.2f`%.2f'%(np.abs(branch.Y),np.angle(branch.Y)),
-                '%.2f`%.2f'%(np.abs(branch.Flow),np.angle(branch.Flow)),
-                '%.3f`%.2f'%(np.abs(branch.Loss),np.angle(branch.Loss)),
-                '%.2f`%.2f'%(np.abs(branch.I),np.angle(branch.I)),
-                '%.2f'%branch.Irated
+                '%.2f`%.2f'%(Y,aY),
+                '%.2f`%.2f'%(Flow,aFlow),
+                '%.3f`%.2f'%(Loss,aLoss),
+                '%.2f`%.2f'%(I,aI),
+                '%.2f'%Irated[i]
             )]))
         print('\n'.join(table))
         print()
 
     #输出模型总损耗
     def showTotalLoss(self):
-        print(f"Total Loss: {self.model.loss}[{'%.2f`%.2f'%(np.abs(self.model.loss),np.angle(self.model.loss))}]")
\ No newline at end of file
+        print(f"Total Loss: {self.model.loss}[{'%.2f`%.2f'%(np.abs(self.model.loss),np.angle(self.model.loss))}]")
+
+    #节点结果的各列数组，按节点添加(输入文件)的顺序排列，不受求解时节点编号的影响
+    def nodeColumns(self):
+        buses = self.model.state.buses
+        order = self.model.inputOrder()
+        names = np.array([node.name for node in self.model.nodes], dtype=str)
+        return {
+            'name': names[order],
+            'type': np.array([NodeType(value).name for value in range(1, 4)])[buses.type[order] - 1],
+            'Vm': np.abs(buses.V[order]),
+            'Va': np.angle(buses.V[order]),
+            'P': buses.P[order],
+            'Q': buses.Q[order],
+            'Pd': buses.Pd[order],
+            'Qd': buses.Qd[order],
+            'Pg': buses.Pg[order],
+            'Qg': buses.Qg[order],
+        }
+
+    #支路结果的各列数组，P、Q为首端功率
+    def branchColumns(self):
+        branches = self.model.state.branches
+        names = np.array([node.name for node in self.model.nodes], dtype=str)
+        return {
+            'name': np.array([branch.name for branch in self.model.branches], dtype=str),
+            'from': names[branches.f],
+            'to': names[branches.t],
+            'inService': branches.inService.copy(),
+            'P': branches.Flow.real.copy(),
+            'Q': branches.Flow.imag.copy(),
+            'Ploss': branches.Loss.real.copy(),
+            'Qloss': branches.Loss.imag.copy(),
+            'I': np.abs(branches.I),
+            'Irated': branches.Irated.copy(),
+        }
+
+    #导出节点结果，target为文件路径(按扩展名选择格式)或已打开的ResultWriter，
+    #extra为附加的列，如批量计算时的场景编号
+    def exportNodes(self, target, **extra):
+        return self._export(target, self.nodeColumns(), extra)
+
+    #导出支路结果，参数同exportNodes
+    def exportBranches(self, target, **extra):
+        return self._export(target, self.branchColumns(), extra)
+
+    def _export(self, target, columns, extra):
+        n = len(next(iter(columns.values())))
+        columns.update({name: np.broadcast_to(value, n) for name, value in extra.items()})
+        if isinstance(target, ResultWriter):
+            target.write(columns)
+            return target
+        with ResultWriter(target) as writer:
+            writer.write(columns)
+        return writer
+
+#按块写出结果数组的流式写入器，支持CSV、Parquet(需要pyarrow)和NPZ格式
+#每次write追加若干行，按chunkSize分块写出，CSV不逐行格式化，整块数组一次转换为文本
+#NPZ格式的各列先以原始字节写入临时文件，关闭时逐列写入压缩包，内存中只保留当前块
+class ResultWriter:
+    FORMATS = {'.csv': 'csv', '.parquet': 'parquet', '.npz': 'npz'}
+
+    def __init__(self, path, format=None, chunkSize=65536):
+        if format is None:
+            format = self.FORMATS.get(os.path.splitext(path)[1].lower())
+        if format not in self.FORMATS.values():
+            raise ValueError(f'Unknown result format for {path}')
+        self.path = path
+        self.format = format
+        self.chunkSize = chunkSize
+        self.columns = None #列名，第一次写入时确定
+        self.rows = 0
+        self.file = None
+        self.parquet = None
+        self.spools = {} #NPZ格式各列的临时文件和每块的(dtype, 行数)
+
+        if format == 'parquet':
+            try:
+                import pyarrow
+                import pyarrow.parquet
+            except ImportError:
+                raise ImportError('Parquet export requires pyarrow (pip install pyarrow)') from None
+            self.pyarrow = pyarrow
+        elif format == 'csv':
+            self.file = open(path, 'w', encoding='utf-8', newline='')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    #追加若干行，columns为列名到等长数组的映射，列名和顺序与第一次写入相同
+    def write(self, columns):
+        if self.columns is None:
+            self.columns = list(columns)
+            if self.format == 'csv':
+                self.file.write(','.join(self.columns) + '\n')
+        elif list(columns) != self.columns:
+            raise ValueError('Result columns differ from the first chunk')
+
+        arrays = [np.asarray(columns[name]) for name in self.columns]
+        n = len(arrays[0])
+        for start in range(0, n, self.chunkSize):
+            self.writeChunk([array[start:start + self.chunkSize] for array in arrays])
+        self.rows += n
+
+    def writeChunk(self, arrays):
+        if self.format == 'csv':
+            #整列转换为文本后逐列拼接，一块只生成一次字符串
+            text = [self.csvText(array) for array in arrays]
+            lines = text[0]
+            for column in text[1:]:
+                lines = np.char.add(np.char.add(lines, ','), column)
+            self.file.write('\n'.join(lines.tolist()) + '\n')
+        elif self.format == 'parquet':
+            table = self.pyarrow.table(dict(zip(self.columns, arrays)))
+            if self.parquet is None:
+                self.parquet = self.pyarrow.parquet.ParquetWriter(self.path, table.schema)
+            self.parquet.write_table(table)
+        else:
+            for name, array in zip(self.columns, arrays):
+                if array.dtype.hasobject:
+                    raise ValueError(f'Column {name} has object dtype and cannot be written to NPZ')
+                if name not in self.spools:
+                    self.spools[name] = (tempfile.TemporaryFile(), [])
+                spool, segments = self.spools[name]
+                spool.write(np.ascontiguousarray(array).tobytes())
+                segments.append((array.dtype, len(array)))
+
+    #一列数组转换为CSV文本，含逗号、引号的字符串加引号
+    @staticmethod
+    def csvText(array):
+        text = array.astype(str)
+        if array.dtype.kind == 'U':
+            special = (np.char.find(text, ',') >= 0) | (np.char.find(text, '"') >= 0) | (np.char.find(text, '\n') >= 0)
+            if special.any():
+                quoted = np.char.add(np.char.add('"', np.char.replace(text, '"', '""')), '"')
+                text = np.where(special, quoted, text)
+        return text
+
+    def close(self):
+        if self.format == 'csv' and self.file is not None:
+            self.file.close()
+            self.file = None
+        elif self.format == 'parquet' and self.parquet is not None:
+            self.parquet.close()
+            self.parquet = None
+        elif self.format == 'npz' and self.columns is not None:
+            try:
+                self.writeNpz()
+            finally:
+                for spool, _ in self.spools.values():
+                    spool.close()
+                self.spools = {}
+                self.columns = None
+
+    #将临时文件中的各列写为压缩包中的.npy成员，与np.savez的结果相同
+    #各块的dtype不同时(如字符串长度不同)按np.result_type统一，逐块转换后写出
+    def writeNpz(self):
+        path = self.path if self.path.endswith('.npz') else self.path + '.npz'
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED, allowZip64=True) as archive:
+            for name in self.columns:
+                if name not in self.spools:
+                    with archive.open(name + '.npy', 'w', force_zip64=True) as member:
+                        np.lib.format.write_array(member, np.array([]))
+                    continue
+                spool, segments = self.spools[name]
+                dtype = np.result_type(*[segment for segment, _ in segments])
+                header = {'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False,
+                          'shape': (sum(rows for _, rows in segments),)}
+                spool.seek(0)
+                with archive.open(name + '.npy', 'w', force_zip64=True) as member:
+                    np.lib.format.write_array_header_1_0(member, header)
+                    for segment, rows in segments:
+                        chunk = np.frombuffer(spool.read(rows * segment.itemsize), dtype=segment)
+                        member.write(chunk.astype(dtype, copy=False).tobytes())
\ No newline at end of file
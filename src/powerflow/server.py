@@ -0,0 +1,216 @@
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from powerflow.cache import loadCase
+from powerflow.Newton_Polar import NewtonPolar
+from powerflow.Newton_Cartesian import NewtonCartesian
+from powerflow.Fast_Decoupled import FastDecoupled
+from powerflow.telemetry import telemetry
+
+#常驻的潮流计算服务：组建好的模型、节点导纳矩阵和求解器(雅可比矩阵结构和分解)保存在内存中，
+#客户端只提交注入功率和支路投退的修改，服务返回求解结果，省去每次启动进程、解析算例和冷启动的开销
+#协议为每行一个JSON对象的请求和响应，可监听本机TCP端口或Unix套接字；求解在线程池中进行，同一模型的请求依次执行
+
+SOLVERS = {
+    'NewtonPolar': NewtonPolar,
+    'NewtonCartesian': NewtonCartesian,
+    'FastDecoupled': FastDecoupled,
+}
+
+#服务中的一个模型及其求解器
+class Session:
+    def __init__(self, path, solver='NewtonPolar', sparse=True):
+        self.path = path
+        self.model = loadCase(path)
+        self.cal = SOLVERS[solver](self.model, sparse=sparse)
+        if hasattr(self.cal, 'reuse'):
+            self.cal.reuse = True
+        self.lock = asyncio.Lock()
+
+        model = self.model
+        self.order = model.inputOrder()
+        self.names = [model.nodes[i].name for i in self.order.tolist()]
+        #基态数据，reset时恢复
+        buses, branches = model.state.buses, model.state.branches
+        self.base = (buses.P.copy(), buses.Q.copy(), buses.Pd.copy(), buses.Qd.copy(), buses.V.copy(), branches.inService.copy())
+
+    #恢复基态的注入功率、电压和支路投退状态
+    def reset(self):
+        model = self.model
+        buses, branches = model.state.buses, model.state.branches
+        P, Q, Pd, Qd, V, inService = self.base
+        for k in np.flatnonzero(branches.inService != inService).tolist():
+            model.switchBranch(model.branches[k].name, bool(inService[k]))
+        buses.P, buses.Q, buses.Pd, buses.Qd, buses.V = P, Q, Pd, Qd, V
+
+    #应用修改并求解，request中可包含：
+    #  reset：先恢复基态
+    #  injections：{节点名: [ΔP, ΔQ]}，注入功率的增量(标幺值)
+    #  loads：{节点名: [Pd, Qd]}，节点负荷(标幺值)
+    #  branches：{支路名: 是否投入运行}
+    #  fields：返回的结果，可选Vm、Va、P、Q、Pf、Qf、loss
+    def solve(self, request):
+        model = self.model
+        buses = model.state.buses
+        if request.get('reset'):
+            self.reset()
+        for name, (dP, dQ) in request.get('injections', {}).items():
+            node = model.nodeDict[name]
+            node.P += dP
+            node.Q += dQ
+        for name, (Pd, Qd) in request.get('loads', {}).items():
+            node = model.nodeDict[name]
+            node.P += node.Pd - Pd
+            node.Q += node.Qd - Qd
+            node.Pd, node.Qd = Pd, Qd
+        for name, inService in request.get('branches', {}).items():
+            model.switchBranch(name, bool(inService))
+
+        start = time.perf_counter()
+        self.cal.solve()
+        seconds = time.perf_counter() - start
+
+        response = {
+            'converged': bool(getattr(self.cal, 'converged', True)),
+            'iterations': int(getattr(self.cal, 'iterations', 0)),
+            'seconds': seconds,
+        }
+        branches = model.state.branches
+        values = {
+            'Vm': lambda: np.abs(buses.V)[self.order],
+            'Va': lambda: np.angle(buses.V)[self.order],
+            'P': lambda: buses.P[self.order],
+            'Q': lambda: buses.Q[self.order],
+            'Pf': lambda: branches.Flow.real,
+            'Qf': lambda: branches.Flow.imag,
+        }
+        for field in request.get('fields', ['Vm', 'Va']):
+            if field == 'loss':
+                response['loss'] = [model.loss.real, model.loss.imag]
+            else:
+                response[field] = values[field]().tolist()
+        return response
+
+#潮流计算服务
+class SolverServer:
+    def __init__(self, workers=None):
+        self.sessions = {}
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+
+    #处理一个请求，返回响应
+    async def handle(self, request):
+        op = request.get('op')
+        loop = asyncio.get_running_loop()
+        if op == 'ping':
+            return {'ok': True}
+        if op == 'list':
+            return {'ok': True, 'cases': {name: {'path': session.path, 'buses': len(session.names)} for name, session in self.sessions.items()}}
+        if op == 'load':
+            path = request['path']
+            name = request.get('name', os.path.splitext(os.path.basename(path))[0])
+            session = await loop.run_in_executor(self.pool, Session, path, request.get('solver', 'NewtonPolar'), request.get('sparse', True))
+            self.sessions[name] = session
+            return {'ok': True, 'name': name, 'buses': session.names, 'branches': [branch.name for branch in session.model.branches]}
+        if op == 'unload':
+            self.sessions.pop(request['name'])
+            return {'ok': True}
+        if op == 'solve':
+            session = self.sessions[request['name']]
+            #同一模型的请求依次执行，不同模型在线程池中并行
+            async with session.lock:
+                response = await loop.run_in_executor(self.pool, session.solve, request)
+            response['ok'] = True
+            return response
+        raise ValueError(f'Unknown operation: {op}')
+
+    #处理一个连接，每行一个请求，按收到的顺序返回响应
+    async def serve(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request = {}
+                try:
+                    request = json.loads(line)
+                    with telemetry.phase('request', op=request.get('op')):
+                        response = await self.handle(request)
+                except Exception as e:
+                    response = {'ok': False, 'error': f'{type(e).__name__}: {e}'}
+                if 'id' in request:
+                    response['id'] = request['id']
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    #启动服务，path不为None时监听Unix套接字，否则监听host:port
+    async def start(self, host='127.0.0.1', port=8765, path=None):
+        if path is not None:
+            return await asyncio.start_unix_server(self.serve, path=path)
+        return await asyncio.start_server(self.serve, host, port)
+
+#简单的同步客户端
+class Client:
+    def __init__(self, host='127.0.0.1', port=8765, path=None):
+        if path is not None:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.connect(path)
+        else:
+            self.socket = socket.create_connection((host, port))
+        self.file = self.socket.makefile('rwb')
+
+    #发送一个请求并等待响应，服务返回错误时抛出RuntimeError
+    def request(self, op, **fields):
+        self.file.write(json.dumps({'op': op, **fields}).encode() + b'\n')
+        self.file.flush()
+        response = json.loads(self.file.readline())
+        if not response.get('ok'):
+            raise RuntimeError(response.get('error'))
+        return response
+
+    def close(self):
+        self.file.close()
+        self.socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+async def _main(args):
+    server = SolverServer(args.workers)
+    for path in args.cases:
+        await server.handle({'op': 'load', 'path': path, 'sparse': not args.dense})
+    listener = await server.start(args.host, args.port, args.unix)
+    print(f"Serving on {args.unix or f'{args.host}:{args.port}'}", file=sys.stderr)
+    async with listener:
+        await listener.serve_forever()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Power flow solver service')
+    parser.add_argument('cases', nargs='*', help='.th files to load at startup')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help='listen on this Unix socket instead of TCP')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--dense', action='store_true', help='use dense Y matrices')
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(_main(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,138 @@
+import numpy as np
+
+#列存储的电网状态：节点和支路的各个量分别保存为连续的NumPy数组，
+#Node和Branch对象只保存所在的表和行号，求解器直接读写整列数据，不再逐个对象复制
+
+#节点数据列
+BUS_COLUMNS = {
+    'type': np.int8, #NodeType的值
+    'canChangeType': bool,
+    'P': float, 'Pg': float, 'Pd': float,
+    'Q': float, 'Qg': float, 'Qd': float,
+    'V': complex, 'oV': complex,
+    'Pmin': float, 'Pmax': float, 'Qmin': float, 'Qmax': float, 'Vmin': float, 'Vmax': float,
+    'Ys': complex,
+}
+
+#支路数据列，f、t为两端节点在节点表中的行号
+BRANCH_COLUMNS = {
+    'f': np.int64, 't': np.int64,
+    'inService': bool,
+    'Y': complex, 'Ys1': complex, 'Ys2': complex,
+    'I': complex, 'Flow': complex, 'Loss': complex,
+    'Irated': float,
+}
+
+#数据表，每列一个数组，容量不足时加倍扩充
+#table.P 返回当前行数长度的视图，可原地修改；table.P = x 按列整体赋值
+class Table:
+    def __init__(self, columns, capacity=0):
+        self.columns = columns
+        self.count = 0
+        self.capacity = capacity
+        self.data = {name: np.zeros(capacity, dtype=dtype) for name, dtype in columns.items()}
+
+    def __len__(self):
+        return self.count
+
+    def __getattr__(self, name):
+        data = self.__dict__.get('data')
+        if data is None or name not in data:
+            raise AttributeError(name)
+        return data[name][:self.count]
+
+    def __setattr__(self, name, value):
+        data = self.__dict__.get('data')
+        if data is not None and name in data:
+            data[name][:self.count] = value
+        else:
+            super().__setattr__(name, value)
+
+    #扩充容量
+    def reserve(self, capacity):
+        if capacity <= self.capacity:
+            return
+        for name, array in self.data.items():
+            grown = np.zeros(capacity, dtype=array.dtype)
+            grown[:self.count] = array[:self.count]
+            self.data[name] = grown
+        self.capacity = capacity
+
+    #添加一行，返回行号
+    def append(self, row=None):
+        if self.count == self.capacity:
+            self.reserve(max(8, 2 * self.capacity))
+        index = self.count
+        self.count += 1
+        if row is not None:
+            for name, value in row.items():
+                self.data[name][index] = value
+        return index
+
+    #读取一行数据
+    def row(self, index):
+        return {name: array[index] for name, array in self.data.items()}
+
+    #按order重排各行，第i行变为原来的第order[i]行
+    def permute(self, order):
+        for name, array in self.data.items():
+            array[:self.count] = array[:self.count][order]
+
+    #删除一行，其后各行前移
+    def delete(self, index):
+        for array in self.data.values():
+            array[index:self.count - 1] = array[index + 1:self.count]
+        self.count -= 1
+
+    #序列化时只保存有效行
+    def __getstate__(self):
+        return {'columns': self.columns, 'data': {name: array[:self.count].copy() for name, array in self.data.items()}}
+
+    def __setstate__(self, state):
+        self.__dict__['columns'] = state['columns']
+        self.__dict__['data'] = state['data']
+        self.__dict__['count'] = self.__dict__['capacity'] = len(next(iter(state['data'].values()))) if state['data'] else 0
+
+#未加入模型的单个节点或支路的数据，只有一行，以列表存储，创建开销小
+class Row:
+    def __init__(self, columns, row):
+        self.columns = columns
+        self.count = 1
+        self.data = {name: [row[name] if name in row else dtype()] for name, dtype in columns.items()}
+
+    def row(self, index):
+        return {name: values[index] for name, values in self.data.items()}
+
+#Node、Branch上的属性，读写所在表的对应行
+class Column:
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        return obj.table.data[self.name][obj.index]
+
+    def __set__(self, obj, value):
+        obj.table.data[self.name][obj.index] = value
+
+#整个电网的节点表和支路表
+class NetworkState:
+    def __init__(self):
+        self.buses = Table(BUS_COLUMNS)
+        self.branches = Table(BRANCH_COLUMNS)
+
+    #重排节点，支路两端的节点行号随之更新
+    def permuteBuses(self, order):
+        order = np.asarray(order)
+        self.buses.permute(order)
+        inverse = np.empty(len(order), dtype=np.int64)
+        inverse[order] = np.arange(len(order))
+        self.branches.f = inverse[self.branches.f]
+        self.branches.t = inverse[self.branches.t]
+        return inverse
+
+    #节点表和支路表占用的内存(字节)
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for table in (self.buses, self.branches) for array in table.data.values())
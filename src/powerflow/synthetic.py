@@ -0,0 +1,107 @@
+import os
+import numpy as np
+from scipy.spatial import Delaunay, cKDTree
+from scipy.sparse.csgraph import minimum_spanning_tree
+import scipy.sparse as sp
+
+#合成算例生成器，用于生成规模从百余节点到数万节点的.th文件以测试程序的扩展性
+#节点随机分布在平面上，以Delaunay三角剖分的最小生成树保证连通，再加入较短的剩余边形成环网，
+#线路阻抗与节点间距离成正比，发电机在平面上分散布置并就近供电以避免长距离输电
+def generateCase(n, path, seed=0, meshRatio=0.4, loadRatio=0.7, genRatio=0.12, trfoRatio=0.05, shuntRatio=0.02, backboneRatio=0.02, loading=1.0):
+    if n < 4:
+        raise ValueError('Synthetic cases need at least 4 buses')
+    rng = np.random.default_rng(seed)
+
+    #节点坐标，平均相邻距离约为1
+    xy = rng.random((n, 2)) * np.sqrt(n)
+    edges, length = meshEdges(xy, meshRatio)
+
+    #平衡节点取最靠近中心的节点，在平衡节点和随机选取的枢纽节点之间再建立一层阻抗较小的主网，
+    #相当于更高电压等级的输电网，网损从平衡节点经主网送出，大规模算例的相角差不会随规模累积
+    slack = int(np.argmin(np.linalg.norm(xy - np.sqrt(n) / 2, axis=1)))
+    hubs = np.unique(np.append(rng.choice(n, size=max(3, int(backboneRatio * n)), replace=False), slack))
+    if len(hubs) >= 4:
+        hubEdges, hubLength = meshEdges(xy[hubs], 0.5)
+        edges = np.concatenate([edges, hubs[hubEdges]])
+        length = np.concatenate([length, hubLength * 0.1])
+    m = len(edges)
+
+    #发电机节点在平衡节点以外的节点中随机选取
+    others = np.delete(np.arange(n), slack)
+    gens = np.sort(rng.choice(others, size=max(1, int(genRatio * n)), replace=False))
+    loads = np.sort(rng.choice(n, size=max(1, int(loadRatio * n)), replace=False))
+
+    #负荷，标幺值，功率因数0.9~0.98
+    Pd = loading * rng.uniform(0.005, 0.03, len(loads))
+    Qd = Pd * np.tan(np.arccos(rng.uniform(0.9, 0.98, len(loads))))
+    #每个负荷由最近的发电机(或平衡节点)供电，发电机出力等于其供电区域内的负荷，
+    #潮流只在局部流动，平衡节点只需补足网损
+    sources = np.append(gens, slack)
+    _, nearest = cKDTree(xy[sources]).query(xy[loads])
+    Pg = np.bincount(nearest, weights=Pd, minlength=len(sources))[:len(gens)]
+
+    #线路参数，电抗与距离成正比
+    X = np.clip(0.03 * length, 0.01, None)
+    R = X * rng.uniform(0.1, 0.35, m)
+    Bf2 = X * rng.uniform(0.1, 0.3, m)
+    trfo = rng.random(m) < trfoRatio
+
+    lines = [f'* synthetic case: {n} buses, {m} branches, seed {seed}']
+    names = [f'BUS-{i + 1}' for i in range(n)]
+    for k in range(m):
+        f, t = names[edges[k, 0]], names[edges[k, 1]]
+        if trfo[k]:
+            lines.append(f'THTRFO  T{k + 1}  {f}  {t}  0.000000  {X[k] * 3:.6f}  {rng.uniform(97.5, 102.5):.2f}')
+        else:
+            lines.append(f'THLINE  L{k + 1}  {f}  {t}  {R[k]:.6f}  {X[k]:.6f}  {-Bf2[k]:.6f}')
+    lines.append('*')
+    for i in np.sort(rng.choice(n, size=int(shuntRatio * n), replace=False)).tolist():
+        lines.append(f'THSHUNT  SH{i + 1}  {names[i]}  0.000000  {rng.uniform(0.01, 0.05):.6f}')
+    lines.append('*')
+    for k, i in enumerate(loads.tolist()):
+        lines.append(f'THLOAD  D{i + 1}  {names[i]}  {Pd[k]:.6f}  {Qd[k]:.6f}')
+    lines.append('*')
+    #发电机功率单位为MW，Q上下限按出力给出
+    for k, i in enumerate(gens.tolist()):
+        lines.append(f'GENERCV  G{i + 1}  {names[i]}  {Pg[k] * 100:.4f}  0.000000  {rng.uniform(1.0, 1.04):.4f}  1')
+    for k, i in enumerate(gens.tolist()):
+        lines.append(f'GENERDATA G{i + 1} 0. 0. 0. 0. 0. {Pg[k] * 200:.2f} 0.00 {Pg[k] * 100:.2f} {-Pg[k] * 50:.2f} 1.5 0 0 0. 0 1')
+    lines.append(f'GENER  G{slack + 1}  {names[slack]}  0.000000  0.000000  1')
+    lines.append('*')
+    lines.append(f'THSLACK  G{slack + 1}  1.030000  0')
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    return path
+
+#平面上的环网：Delaunay三角剖分的最小生成树，加上extra×节点数条最短的剩余边，返回(边, 长度)
+def meshEdges(xy, extra):
+    n = len(xy)
+    #三角剖分的所有边，再加入每个节点到最近邻节点的边，避免三角剖分丢弃重合点后出现孤立节点
+    tri = Delaunay(xy).simplices
+    _, near = cKDTree(xy).query(xy, k=2)
+    edges = np.concatenate([tri[:, [0, 1]], tri[:, [1, 2]], tri[:, [0, 2]], near])
+    edges = np.unique(np.sort(edges, axis=1), axis=0)
+    edges = edges[edges[:, 0] != edges[:, 1]]
+    length = np.linalg.norm(xy[edges[:, 0]] - xy[edges[:, 1]], axis=1)
+
+    #最小生成树保证连通，再按长度从短到长加入部分剩余边
+    G = sp.coo_matrix((length, (edges[:, 0], edges[:, 1])), shape=(n, n))
+    tree = minimum_spanning_tree(G).tocoo()
+    inTree = set(zip(np.minimum(tree.row, tree.col).tolist(), np.maximum(tree.row, tree.col).tolist()))
+    isTree = np.array([(f, t) in inTree for f, t in edges.tolist()], dtype=bool)
+    rest = np.flatnonzero(~isTree)
+    rest = rest[np.argsort(length[rest])][:int(extra * n)]
+    chosen = np.concatenate([np.flatnonzero(isTree), np.sort(rest)])
+    return edges[chosen], length[chosen]
+
+#在目录下生成一组算例，已存在的文件不再重新生成，返回文件路径列表
+def generateCases(sizes, directory, seed=0, **options):
+    paths = []
+    for n in sizes:
+        path = os.path.join(directory, f'SYN-{n}-{seed}.th')
+        if not os.path.exists(path):
+            generateCase(n, path, seed=seed, **options)
+        paths.append(path)
+    return paths
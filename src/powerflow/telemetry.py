@@ -0,0 +1,108 @@
+import json
+import time
+import contextlib
+
+#运行监测：分阶段计时和每次迭代的不平衡量记录，发送到可插拔的接收端
+#没有接收端时phase()返回共享的空上下文，iteration()直接返回，不产生额外开销
+class Telemetry:
+    def __init__(self):
+        self.sinks = []
+
+    #添加接收端，返回该接收端便于链式使用
+    def addSink(self, sink):
+        self.sinks.append(sink)
+        return sink
+
+    def removeSink(self, sink):
+        self.sinks.remove(sink)
+
+    @property
+    def enabled(self):
+        return bool(self.sinks)
+
+    #阶段计时，用法: with telemetry.phase('ybus'): ...
+    def phase(self, name, **fields):
+        if not self.sinks:
+            return _NULL_PHASE
+        return _Phase(self, name, fields)
+
+    #记录一次迭代的不平衡量
+    def iteration(self, solver, iteration, mismatch, **fields):
+        if not self.sinks:
+            return
+        self.emit({'type': 'iteration', 'solver': solver, 'iteration': int(iteration), 'mismatch': float(mismatch), **fields})
+
+    #记录其他事件
+    def event(self, name, **fields):
+        if not self.sinks:
+            return
+        self.emit({'type': 'event', 'name': name, **fields})
+
+    def emit(self, record):
+        for sink in self.sinks:
+            sink.write(record)
+
+    #在with块中临时添加接收端
+    @contextlib.contextmanager
+    def listen(self, sink):
+        self.addSink(sink)
+        try:
+            yield sink
+        finally:
+            self.removeSink(sink)
+
+_NULL_PHASE = contextlib.nullcontext()
+
+#阶段计时上下文
+class _Phase:
+    def __init__(self, telemetry, name, fields):
+        self.telemetry = telemetry
+        self.name = name
+        self.fields = fields
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.telemetry.emit({'type': 'phase', 'name': self.name, 'seconds': time.perf_counter() - self.start, **self.fields})
+        return False
+
+#丢弃所有记录
+class NullSink:
+    def write(self, record):
+        pass
+
+#保存在内存中，并按阶段汇总耗时
+class MemorySink:
+    def __init__(self):
+        self.records = []
+
+    def write(self, record):
+        self.records.append(record)
+
+    #各阶段累计耗时
+    def phases(self):
+        total = {}
+        for record in self.records:
+            if record['type'] == 'phase':
+                total[record['name']] = total.get(record['name'], 0.) + record['seconds']
+        return total
+
+    #某个求解器的迭代记录
+    def iterations(self, solver=None):
+        return [record for record in self.records if record['type'] == 'iteration' and (solver is None or record['solver'] == solver)]
+
+#每条记录写为JSON文件中的一行
+class JsonLinesSink:
+    def __init__(self, path):
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def write(self, record):
+        self.file.write(json.dumps(record, default=float) + '\n')
+
+    def close(self):
+        self.file.close()
+
+#全局默认监测对象
+telemetry = Telemetry()
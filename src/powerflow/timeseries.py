@@ -0,0 +1,160 @@
+import os
+import csv
+import zipfile
+import contextlib
+import itertools
+import tempfile
+import numpy as np
+from powerflow.model import Model
+from powerflow.Newton_Polar import NewtonPolar
+from powerflow.telemetry import telemetry
+
+#准稳态时序仿真：逐时段读取负荷和发电的倍率，修改节点功率后以上一时段的结果为初值求解，
+#节点导纳矩阵和求解器(包括雅可比矩阵结构和分解)在整个时序中复用，结果逐时段写入内存映射的.npy文件，
+#倍率文件按块读取，内存占用与时段数无关
+
+#时序倍率文件，每行一个时段，列名为：
+#  load、gen：所有节点的负荷、发电倍率
+#  load:节点名、gen:节点名：单个节点的倍率，优先于整体倍率
+#其他列(如时间、时段序号)忽略。NPZ需包含columns(列名)和values(时段数×列数，按行存储)两个数组
+#CSV和NPZ都按块读取：NPZ的values不整体加载，直接从压缩包成员中逐块读出若干行
+class ProfileReader:
+    def __init__(self, path, chunkSize=1024):
+        self.path = path
+        self.chunkSize = chunkSize
+        if path.lower().endswith('.npz'):
+            with np.load(path, allow_pickle=False) as data:
+                self.columns = data['columns'].tolist()
+            with self.openValues() as (f, shape, dtype):
+                self.steps = shape[0]
+        else:
+            with open(path, newline='') as f:
+                self.columns = [name.strip() for name in next(csv.reader(f))]
+                self.steps = sum(1 for line in f if line.strip())
+
+    def __len__(self):
+        return self.steps
+
+    #打开NPZ中的values成员并读取.npy文件头，返回(位于数据开头的文件对象, 形状, dtype)
+    @contextlib.contextmanager
+    def openValues(self):
+        with zipfile.ZipFile(self.path) as archive, archive.open('values.npy') as f:
+            version = np.lib.format.read_magic(f)
+            header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+            shape, fortran, dtype = header(f)
+            if fortran or dtype.hasobject or len(shape) != 2:
+                raise ValueError(f'values in {self.path} must be a 2-D C-ordered numeric array')
+            yield f, shape, dtype
+
+    #逐时段产生一行倍率
+    def __iter__(self):
+        if self.path.lower().endswith('.npz'):
+            with self.openValues() as (f, shape, dtype):
+                rowBytes = shape[1] * dtype.itemsize
+                for start in range(0, self.steps, self.chunkSize):
+                    rows = min(self.chunkSize, self.steps - start)
+                    chunk = np.frombuffer(f.read(rows * rowBytes), dtype=dtype).reshape(rows, shape[1])
+                    yield from chunk.astype(float)
+            return
+        with open(self.path, newline='') as f:
+            next(f)
+            lines = (line for line in f if line.strip())
+            while True:
+                chunk = list(itertools.islice(lines, self.chunkSize))
+                if not chunk:
+                    return
+                #非数值列(如时间)读为nan，不影响倍率列
+                yield from np.genfromtxt(chunk, delimiter=',', dtype=float, ndmin=2)
+
+#时序仿真，model为已组建的模型，solver为求解器类，默认沿用雅可比矩阵分解
+class TimeSeries:
+    def __init__(self, model: Model, solver=NewtonPolar, sparse=True, reuse=True):
+        self.model = model
+        self.cal = solver(model, sparse=sparse)
+        if hasattr(self.cal, 'reuse'):
+            self.cal.reuse = reuse
+
+        #基准负荷和发电出力，各时段按倍率缩放
+        buses = model.state.buses
+        self.Pd, self.Qd = buses.Pd.copy(), buses.Qd.copy()
+        self.Pg, self.Qg = buses.P + buses.Pd, buses.Q + buses.Qd
+
+    #将倍率文件的各列对应到节点，返回逐时段产生(负荷倍率, 发电倍率)的生成器
+    def multipliers(self, reader):
+        index = {node.name: i for i, node in enumerate(self.model.nodes)}
+        columns = {}
+        for kind in ('load', 'gen'):
+            overall = [k for k, name in enumerate(reader.columns) if name == kind]
+            single = [(k, index[name[len(kind) + 1:]]) for k, name in enumerate(reader.columns)
+                      if name.startswith(kind + ':') and name[len(kind) + 1:] in index]
+            columns[kind] = (overall[0] if overall else None, np.array([k for k, _ in single], dtype=int), np.array([i for _, i in single], dtype=int))
+
+        n = len(self.model.nodes)
+        for row in reader:
+            scales = []
+            for kind in ('load', 'gen'):
+                overall, cols, buses = columns[kind]
+                scale = np.full(n, 1. if overall is None else row[overall])
+                scale[buses] = row[cols]
+                scales.append(scale)
+            yield tuple(scales)
+
+    #逐时段求解，profile为倍率文件路径或ProfileReader，结果写入directory下的.npy文件
+    #返回以内存映射方式打开的结果：节点电压幅值Vm、相角Va(时段数×节点数)，支路首端功率Pf、Qf(时段数×支路数)，
+    #以及各时段是否收敛converged和迭代次数iterations；节点按输入文件的顺序排列
+    def run(self, profile, directory=None, flush=256):
+        reader = profile if isinstance(profile, ProfileReader) else ProfileReader(profile)
+        if directory is None:
+            directory = tempfile.mkdtemp(prefix='powerflow-timeseries-')
+        os.makedirs(directory, exist_ok=True)
+
+        model = self.model
+        buses, branches = model.state.buses, model.state.branches
+        n, m, T = len(buses), len(branches), len(reader)
+        order = model.inputOrder()
+        np.save(os.path.join(directory, 'buses.npy'), np.array([model.nodes[i].name for i in order.tolist()], dtype=str))
+        np.save(os.path.join(directory, 'branches.npy'), np.array([branch.name for branch in model.branches], dtype=str))
+        results = {
+            'Vm': (float, n), 'Va': (float, n), 'Pf': (float, m), 'Qf': (float, m),
+            'converged': (bool, None), 'iterations': (np.int32, None),
+        }
+        results = {name: np.lib.format.open_memmap(os.path.join(directory, f'{name}.npy'), mode='w+', dtype=dtype,
+                                                   shape=(T, width) if width is not None else (T,))
+                   for name, (dtype, width) in results.items()}
+
+        #上一个收敛时段的电压，不收敛时下一时段从该电压重新开始
+        good = buses.V.copy()
+        for step, (load, gen) in enumerate(self.multipliers(reader)):
+            with telemetry.phase('step', step=step):
+                buses.Pd = self.Pd * load
+                buses.Qd = self.Qd * load
+                buses.P = self.Pg * gen - buses.Pd
+                buses.Q = self.Qg * gen - buses.Qd
+                try:
+                    self.cal.solve()
+                    converged = bool(getattr(self.cal, 'converged', True))
+                except (np.linalg.LinAlgError, RuntimeError):
+                    converged = False
+
+            V = buses.V
+            results['converged'][step] = converged
+            results['iterations'][step] = getattr(self.cal, 'iterations', 0)
+            if converged:
+                good = V.copy()
+                results['Vm'][step] = np.abs(V)[order]
+                results['Va'][step] = np.angle(V)[order]
+                results['Pf'][step] = branches.Flow.real
+                results['Qf'][step] = branches.Flow.imag
+            else:
+                for name in ('Vm', 'Va', 'Pf', 'Qf'):
+                    results[name][step] = np.nan
+                buses.V = good
+            if (step + 1) % flush == 0:
+                for array in results.values():
+                    array.flush()
+
+        for array in results.values():
+            array.flush()
+        self.directory = directory
+        self.results = results
+        return results
@@ -13,4 +13,10 @@ def P2Complex(V, theta):
     return V * np.exp(theta * 1j)
 
 def Complex2P(Complex):
-    return np.abs(Complex), np.angle(Complex)
\ No newline at end of file
+    return np.abs(Complex), np.angle(Complex)
+
+#忽略电阻后的支路导纳 1/(jX)
+def XOnly(Y):
+    Y = np.asarray(Y, dtype=complex)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(Y != 0, 1 / (1j * np.imag(1 / Y)), 0j)
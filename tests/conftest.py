@@ -0,0 +1,24 @@
+import os
+import sys
+import pytest
+
+#测试直接导入src下的powerflow包，算例文件与测试位于同一目录
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+CASES = os.path.dirname(os.path.abspath(__file__))
+
+#算例名到算例文件路径
+@pytest.fixture
+def casePath():
+    def path(case):
+        return os.path.join(CASES, f'{case}.th')
+    return path
+
+#由算例名读取并组建模型，每次调用得到新的模型
+@pytest.fixture
+def compose(casePath):
+    from powerflow.model import Model, Profile
+    def compose(case):
+        model = Model()
+        model.compose(Profile(casePath(case)))
+        return model
+    return compose
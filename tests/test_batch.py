@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+from powerflow.Newton_Polar import NewtonPolar
+from powerflow.Newton_Batch import NewtonBatch
+
+#逐场景用NewtonPolar求解，作为批量求解的参照
+def reference(compose, case, P, Q, sparse):
+    V = []
+    for p, q in zip(P, Q):
+        model = compose(case)
+        model.deriveYMatrix(sparse)
+        buses = model.state.buses
+        buses.P, buses.Q = p, q
+        cal = NewtonPolar(model, sparse=sparse)
+        cal.solve()
+        assert cal.converged
+        V.append(buses.V.copy())
+    return np.array(V)
+
+#负荷倍率不同的场景，P、Q为(场景数×节点数)
+def scenarios(batch, scales):
+    return batch.P0 * np.asarray(scales)[:, None], batch.Q0 * np.asarray(scales)[:, None]
+
+@pytest.mark.parametrize('case', ['IEEE-14', 'IEEE-30', 'IEEE-39'])
+@pytest.mark.parametrize('sparse', [True, False])
+@pytest.mark.parametrize('count', [1, 2, 3, 8])
+def test_matches_polar(compose, case, sparse, count):
+    batch = NewtonBatch(compose(case), sparse=sparse)
+    P, Q = scenarios(batch, np.linspace(0.9, 1.1, count))
+    V = batch.solve(P, Q)
+    assert batch.converged.all()
+    #平衡节点和PV节点的无功注入由求解结果决定，参照解只比较电压
+    assert np.abs(V - reference(compose, case, P, Q, sparse)).max() < 1e-6
+
+#只有部分场景收敛：发散的场景标记为不收敛，其余场景的结果不受影响
+@pytest.mark.parametrize('sparse', [True, False])
+def test_partial_convergence(compose, sparse):
+    batch = NewtonBatch(compose('IEEE-14'), sparse=sparse)
+    batch.maxIterations = 20
+    P, Q = scenarios(batch, [1.0, 50.0, 1.05])
+    with np.errstate(all='ignore'):
+        V = batch.solve(P, Q)
+    assert batch.converged.tolist() == [True, False, True]
+    good = [0, 2]
+    assert np.abs(V[good] - reference(compose, 'IEEE-14', P[good], Q[good], sparse)).max() < 1e-6
+
+#稠密模式按块求解，块大小不影响结果
+def test_dense_chunks(compose):
+    batch = NewtonBatch(compose('IEEE-30'), sparse=False)
+    P, Q = scenarios(batch, np.linspace(0.9, 1.1, 7))
+    V = batch.solve(P, Q)
+    size = batch.jacobian.shape[0]
+    batch.denseBytes = 2 * size * size * 8
+    assert np.abs(batch.solve(P, Q) - V).max() < 1e-12
+    assert batch.converged.all()
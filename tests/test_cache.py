@@ -0,0 +1,16 @@
+import os
+import shutil
+import pytest
+from powerflow.cache import loadCase
+
+#缓存无法写入时给出警告，仍返回解析得到的模型
+def test_unwritable_cache(tmp_path, casePath):
+    path = tmp_path / 'IEEE-14.th'
+    shutil.copy(casePath('IEEE-14'), path)
+    #缓存目录的位置上已有同名文件，无法创建目录
+    blocked = tmp_path / 'blocked'
+    blocked.write_text('')
+    with pytest.warns(RuntimeWarning, match='case cache'):
+        model = loadCase(str(path), cacheDir=str(blocked))
+    assert len(model.nodes) == 14
+    assert sorted(os.listdir(tmp_path)) == ['IEEE-14.th', 'blocked']
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from powerflow.contingency import ContingencyAnalysis
+
+#开断后网络是否解列
+def splits(model, name):
+    model.branchDict[name].inService = False
+    count = model.detectIslands().max() + 1
+    model.branchDict[name].inService = True
+    model.detectIslands()
+    return count > 1
+
+#IEEE-39的支路都未给定额定电流，筛选只应留下网络解列的事故
+@pytest.mark.filterwarnings('error')
+def test_screen_unrated(compose):
+    model = compose('IEEE-39')
+    flagged = ContingencyAnalysis(model, sparse=True).screen(1.0)
+    names = [branch.name for branch in model.branches]
+    assert 0 < len(flagged) < len(names)
+    assert [name for (name,) in flagged] == [name for name in names if splits(model, name)]
+
+@pytest.mark.filterwarnings('error')
+@pytest.mark.parametrize('case, threshold', [('IEEE-14', 0.002), ('IEEE-30', 0.002)])
+def test_screen_threshold(compose, case, threshold):
+    model = compose(case)
+    analysis = ContingencyAnalysis(model, sparse=True)
+    flagged = {name for (name,) in analysis.screen(threshold)}
+    names = [branch.name for branch in model.branches]
+    assert 0 < len(flagged) < len(names)
+    for k, name in enumerate(names):
+        peak = np.fmax.reduce(analysis.screenLoading[:, k], initial=-np.inf)
+        assert (name in flagged) == (splits(model, name) or peak > threshold)
+
+#在当前进程中计算与多进程计算一样，不改变模型中的基态结果
+def test_run_keeps_base_state(compose):
+    model = compose('IEEE-14')
+    analysis = ContingencyAnalysis(model, sparse=True, processes=1)
+    analysis.solveBase()
+    buses, branches = model.state.buses, model.state.branches
+    V, Flow, loss = buses.V.copy(), branches.Flow.copy(), model.loss
+    analysis.run()
+    assert analysis.converged.sum() == len(model.branches) - 1
+    assert np.abs(buses.V - V).max() < 1e-12
+    assert np.abs(branches.Flow - Flow).max() < 1e-12
+    assert model.loss == pytest.approx(loss)
+    assert branches.inService.all()
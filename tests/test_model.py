@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from powerflow.model import Branch
+
+#添加同名支路时应报错，支路表和导纳矩阵保持不变
+@pytest.mark.parametrize('sparse', [True, False])
+def test_add_duplicate_branch(compose, sparse):
+    model = compose('IEEE-14')
+    Y = model.deriveYMatrix(sparse)
+    Y = Y.toarray() if sparse else Y.copy()
+    existing = model.branches[0]
+    count, names = len(model.state.branches), len(model.branchFrom)
+    branch = Branch(existing.name, model.nodes[0], model.nodes[-1], Y=1-10j)
+    with pytest.raises(ValueError):
+        model.addBranch(branch)
+    assert len(model.branches) == len(model.state.branches) == count
+    assert len(model.branchFrom) == len(model.branchTo) == len(model.branchY) == names
+    assert model.branchDict[existing.name] is existing
+    assert np.abs((model.Y.toarray() if sparse else model.Y) - Y).max() == 0
+
+#设置节点编号方式后，按节点编号的B矩阵按该顺序分解，结果与默认排序相同
+@pytest.mark.parametrize('ordering', ['rcm', 'degree'])
+def test_ordering_factorization(compose, ordering):
+    from powerflow.Fast_Decoupled import FastDecoupled
+    results = {}
+    for value in (None, ordering):
+        model = compose('IEEE-39')
+        model.ordering = value
+        cal = FastDecoupled(model, sparse=True)
+        cal.solve()
+        assert cal.Bp_lu.base.permc_spec == model.factorOrdering()
+        results[value] = {node.name: node.V for node in model.nodes}
+    assert model.factorOrdering() == 'NATURAL'
+    for name, V in results[None].items():
+        assert abs(results[ordering][name] - V) < 1e-8
+
+#节点重排后，inputOrder仍按输入文件的顺序给出节点
+@pytest.mark.parametrize('ordering', [None, 'rcm', 'degree'])
+def test_input_order(compose, ordering):
+    model = compose('IEEE-30')
+    names = [node.name for node in model.nodes]
+    assert model.inputOrder().tolist() == list(range(len(names)))
+    model.ordering = ordering
+    model.deriveYMatrix(True)
+    assert [model.nodes[i].name for i in model.inputOrder().tolist()] == names
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from powerflow.model import Model, Profile, NodeType
+from powerflow.synthetic import generateCase
+from powerflow.Newton_Polar import NewtonPolar
+from powerflow.Newton_Cartesian import NewtonCartesian
+
+SOLVERS = [NewtonPolar, NewtonCartesian]
+
+#合成算例的发电机无功限值较小，相当一部分PV节点会越限；SYN-500-1中越限节点需要多轮切换才能确定
+@pytest.fixture(scope='module')
+def synthetic(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('cases')
+    def path(n, seed):
+        path = str(directory / f'SYN-{n}-{seed}.th')
+        generateCase(n, path, seed=seed)
+        return path
+    return path
+
+#无功限值检查后的结果：PV节点无功出力不越限，越限节点的电压在给定值正确的一侧，其余PV节点电压等于给定值
+def checkLimits(model, limited, tol=1e-5):
+    buses = model.state.buses
+    pv = (buses.type == NodeType.PV.value) & buses.canChangeType
+    assert np.all(buses.Qg[pv] <= buses.Qmax[pv] + tol)
+    assert np.all(buses.Qg[pv] >= buses.Qmin[pv] - tol)
+    Vm, Vset = np.abs(buses.V), np.abs(buses.oV)
+    assert np.all(Vm[limited == 1] <= Vset[limited == 1] + tol)
+    assert np.all(Vm[limited == -1] >= Vset[limited == -1] - tol)
+    free = pv & (limited == 0)
+    assert np.abs(Vm[free] - Vset[free]).max(initial=0.) < tol
+
+@pytest.mark.parametrize('solver', SOLVERS)
+@pytest.mark.parametrize('sparse', [True, False])
+@pytest.mark.parametrize('case', ['IEEE-14', 'IEEE-30', 'SYN-300-0', 'SYN-500-1'])
+def test_limits_hold(compose, synthetic, solver, sparse, case):
+    if case.startswith('SYN'):
+        _, n, seed = case.split('-')
+        model = Model()
+        model.compose(Profile(synthetic(int(n), int(seed))))
+    else:
+        model = compose(case)
+    cal = solver(model, sparse=sparse, qlimits=True)
+    cal.solve()
+    assert cal.converged
+    assert cal.limited.any()
+    checkLimits(model, cal.limited)
+
+#无功越限检查的轮数用完后仍有节点越限时，结果记为不收敛
+@pytest.mark.parametrize('solver', SOLVERS)
+def test_switches_exhausted(compose, solver):
+    model = compose('IEEE-30')
+    cal = solver(model, sparse=True, qlimits=True)
+    maxSwitches, cal.maxSwitches = cal.maxSwitches, 0
+    cal.solve()
+    assert not cal.converged
+    cal.maxSwitches = maxSwitches
+    cal.solve()
+    assert cal.converged
@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+from powerflow.report import ResultWriter
+
+#NPZ按块流式写出，结果与一次性np.savez相同，各块的字符串长度和数值类型可以不同
+@pytest.mark.parametrize('chunkSize', [1, 3, 1000])
+def test_npz_chunks(tmp_path, chunkSize):
+    path = str(tmp_path / 'result.npz')
+    blocks = [
+        {'name': np.array(['a', 'bb', 'ccc']), 'V': np.arange(3), 'S': np.array([1+2j, 3-4j, 0j])},
+        {'name': np.array(['dddddd', 'e']), 'V': np.array([0.5, 1.5]), 'S': np.array([5j, 6.])},
+    ]
+    with ResultWriter(path, chunkSize=chunkSize) as writer:
+        for block in blocks:
+            writer.write(block)
+    with np.load(path) as data:
+        assert data.files == ['name', 'V', 'S']
+        for name in data.files:
+            expected = np.concatenate([block[name] for block in blocks])
+            assert data[name].dtype == expected.dtype
+            assert np.array_equal(data[name], expected)
+    assert writer.spools == {}